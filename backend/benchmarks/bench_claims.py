@@ -0,0 +1,87 @@
+"""Costo de codificar/decodificar los claims de un access token y tamaño del header.
+
+    python -m benchmarks.bench_claims --iterations 20000
+
+Compara el formato anterior (schema User completo serializado en "sub") con el
+formato compacto de `src.auth.claims`, con y sin la firma/verificación del JWT.
+"""
+import argparse
+import datetime
+import timeit
+from benchmarks.common import configure_env, format_table
+
+configure_env()
+
+import jwt  # noqa: E402
+from src.auth.claims import claim_codec  # noqa: E402
+from src.settings import ALGORITHM, SECRET_KEY  # noqa: E402
+from src.users import schemas as users_schemas  # noqa: E402
+from src.users.models import Role, User  # noqa: E402
+
+
+def legacy_encode(user: User) -> dict:
+    return {"sub": users_schemas.User.model_validate(user).model_dump_json()}
+
+
+def legacy_decode(payload: dict) -> users_schemas.User:
+    return users_schemas.User.model_validate_json(payload["sub"])
+
+
+def compact_encode(user: User) -> dict:
+    return claim_codec.encode(user.id, user.role_id)
+
+
+def main(iterations: int) -> None:
+    role = Role(id=3, name="secretaria_academica")
+    user = User(
+        id=123456,
+        username="usuario.de.prueba",
+        email="usuario.de.prueba@example.com",
+        hashed_password="x",
+        role_id=role.id,
+        role=role,
+    )
+    exp = datetime.datetime.now(datetime.UTC) + datetime.timedelta(minutes=15)
+
+    def per_call(fn) -> str:
+        return f"{timeit.timeit(fn, number=iterations) / iterations * 1e6:.2f}"
+
+    rows = []
+    for name, encode, decode in (
+        ("anterior", legacy_encode, legacy_decode),
+        ("compacto", compact_encode, claim_codec.decode),
+    ):
+        claims = {**encode(user), "exp": exp}
+        token = jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        rows.append(
+            [
+                name,
+                per_call(lambda: encode(user)),
+                per_call(lambda: decode(payload)),
+                per_call(lambda: jwt.encode({**encode(user), "exp": exp}, SECRET_KEY, algorithm=ALGORITHM)),
+                per_call(lambda: decode(jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]))),
+                len(token),
+                len(f"Authorization: Bearer {token}"),
+            ]
+        )
+    print(
+        format_table(
+            [
+                "formato",
+                "claims enc µs",
+                "claims dec µs",
+                "JWT enc µs",
+                "JWT dec µs",
+                "token bytes",
+                "header bytes",
+            ],
+            rows,
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    main(parser.parse_args().iterations)
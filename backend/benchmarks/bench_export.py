@@ -0,0 +1,87 @@
+"""Throughput y memoria pico de GET /users/export para tablas de distinto tamaño.
+
+    python -m benchmarks.bench_export --rows 10000 100000 500000
+
+Si la exportación es realmente streaming, la memoria pico debe mantenerse
+aproximadamente constante aunque la cantidad de filas crezca.
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from benchmarks.common import call_asgi, configure_env, format_table
+
+configure_env()
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from src.auth.dependencies import has_admin_role  # noqa: E402
+from src.database import Base, engine  # noqa: E402
+from src.main import app  # noqa: E402
+from src.users.models import Role, User  # noqa: E402
+
+FAKE_HASH = "$argon2id$v=19$m=65536,t=3,p=4$benchmark$benchmark"
+
+
+def seed_users(total: int, batch_size: int = 10000) -> None:
+    """Completa la tabla de usuarios hasta `total` filas."""
+    with engine.begin() as conn:
+        role_id = conn.scalar(select(Role.id).where(Role.name == "user"))
+        if role_id is None:
+            role_id = conn.execute(insert(Role).values(name="user")).inserted_primary_key[0]
+        existing = conn.scalar(select(func.count()).select_from(User))
+        for start in range(existing, total, batch_size):
+            conn.execute(
+                insert(User),
+                [
+                    {
+                        "username": f"bench{i}",
+                        "email": f"bench{i}@example.com",
+                        "hashed_password": FAKE_HASH,
+                        "role_id": role_id,
+                    }
+                    for i in range(start, min(start + batch_size, total))
+                ],
+            )
+
+
+async def measure(fmt: str) -> tuple:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    status, received = await call_asgi(app, "GET", "/users/export", f"format={fmt}")
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert status == 200, status
+    return elapsed, received, peak
+
+
+async def run(sizes: list) -> None:
+    Base.metadata.create_all(bind=engine)
+    app.dependency_overrides[has_admin_role] = lambda: None
+    rows = []
+    for size in sorted(sizes):
+        seed_users(size)
+        for fmt in ("ndjson", "csv"):
+            elapsed, received, peak = await measure(fmt)
+            rows.append(
+                [
+                    size,
+                    fmt,
+                    f"{elapsed:.2f}",
+                    f"{size / elapsed:,.0f}",
+                    f"{received / 1e6:.1f}",
+                    f"{peak / 1e6:.2f}",
+                ]
+            )
+    print(
+        format_table(
+            ["rows", "format", "seconds", "rows/s", "MB sent", "peak MB"], rows
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    asyncio.run(run(parser.parse_args().rows))
@@ -0,0 +1,327 @@
+"""Carga concurrente sobre los endpoints de auth y usuarios.
+
+    python -m benchmarks.bench_load --users 1000 --concurrency 16 --duration 10
+    python -m benchmarks.bench_load --uvicorn --workers 2 --save --compare latest
+
+Siembra la base con `src.load_data` (usuarios `bench<N>` con una misma contraseña) y
+ejecuta cada escenario con `--concurrency` clientes durante `--duration` segundos,
+luego de `--warmup` segundos que no se miden. Por defecto los requests se envían a
+la app en el mismo proceso (httpx.ASGITransport); con `--uvicorn` se levanta un
+servidor real y se mide también la capa HTTP. Reporta req/s y p50/p95/p99 por
+operación; `--save` guarda los resultados en `benchmarks/results` y `--compare`
+muestra la variación respecto de una corrida anterior.
+
+Los límites de intentos de login se deshabilitan salvo que se definan en el entorno.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Callable, Dict, List
+from benchmarks.common import (
+    compare_table,
+    configure_env,
+    format_table,
+    load_results,
+    save_results,
+    summarize,
+)
+
+configure_env()
+os.environ.setdefault("LOGIN_RATE_LIMIT_PER_USERNAME", "0")
+os.environ.setdefault("LOGIN_RATE_LIMIT_PER_IP", "0")
+
+import httpx  # noqa: E402
+from src.auth.hashing import hash_password  # noqa: E402
+from src.database import SessionLocal, engine  # noqa: E402
+from src.load_data import create_roles, create_users  # noqa: E402
+from src.upgrade_db import upgrade  # noqa: E402
+
+PASSWORD = "benchmark-password"
+ADMIN = "benchadmin0"
+SCENARIOS = ["login", "refresh", "validate_user", "read_user", "users_crud"]
+
+
+def seed(users: int) -> None:
+    with engine.begin() as conn:
+        upgrade(conn)
+    hashed_password = hash_password(PASSWORD)
+    with SessionLocal() as db:
+        roles = create_roles(db)
+        create_users(db, users, hashed_password, prefix="bench", role_id=roles["user"])
+        create_users(db, 1, hashed_password, prefix="benchadmin", role_id=roles["admin"])
+
+
+class Recorder:
+    """Latencias y errores por operación de los requests iniciados dentro de la
+    ventana de medición.
+    """
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.window = (float("inf"), float("inf"))
+
+    async def call(self, name: str, request) -> httpx.Response:
+        start = time.perf_counter()
+        response = await request
+        if self.window[0] <= start < self.window[1]:
+            self.samples[name].append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                self.errors[name] += 1
+        return response
+
+
+async def _login(client: httpx.AsyncClient, username: str) -> Dict[str, Any]:
+    response = await client.post(
+        "/auth/token", data={"username": username, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    body = response.json()
+    return {"id": body["user_id"], "headers": {"Authorization": f"Bearer {body['access_token']}"}}
+
+
+class Scenario:
+    """Escenario de carga: `setup` prepara el estado de cada cliente (sin medirse) y
+    `step` ejecuta una iteración.
+    """
+
+    def __init__(self, users: int, concurrency: int) -> None:
+        self.users = users
+        self.concurrency = concurrency
+
+    def username(self, worker: int, iteration: int = 0) -> str:
+        # cada cliente usa usuarios distintos, para no medir logins coalescidos
+        return f"bench{(worker + iteration * self.concurrency) % self.users}"
+
+    async def setup(self, client: httpx.AsyncClient, worker: int) -> Dict[str, Any]:
+        return {"worker": worker, "iteration": 0}
+
+    async def step(self, client: httpx.AsyncClient, state: Dict[str, Any], recorder: Recorder):
+        raise NotImplementedError
+
+
+class Login(Scenario):
+    async def step(self, client, state, recorder):
+        state["iteration"] += 1
+        await recorder.call(
+            "login",
+            client.post(
+                "/auth/token",
+                data={
+                    "username": self.username(state["worker"], state["iteration"]),
+                    "password": PASSWORD,
+                },
+            ),
+        )
+
+
+class Refresh(Scenario):
+    async def setup(self, client, worker):
+        # el refresh token queda en la cookie del cliente y rota en cada request
+        await _login(client, self.username(worker))
+        return {}
+
+    async def step(self, client, state, recorder):
+        await recorder.call("refresh", client.put("/auth/token"))
+
+
+class ValidateUser(Scenario):
+    async def setup(self, client, worker):
+        return await _login(client, self.username(worker))
+
+    async def step(self, client, state, recorder):
+        await recorder.call(
+            "validate_user", client.get("/auth/validate-user", headers=state["headers"])
+        )
+
+
+class ReadUser(Scenario):
+    async def setup(self, client, worker):
+        return await _login(client, self.username(worker))
+
+    async def step(self, client, state, recorder):
+        await recorder.call(
+            "read_user", client.get(f"/users/{state['id']}", headers=state["headers"])
+        )
+
+
+class UsersCrud(Scenario):
+    async def setup(self, client, worker):
+        state = await _login(client, ADMIN)
+        state.update(worker=worker, iteration=0, run=int(time.time() * 1000))
+        return state
+
+    async def step(self, client, state, recorder):
+        state["iteration"] += 1
+        username = f"crud{state['run']}-{state['worker']}-{state['iteration']}"
+        headers = state["headers"]
+        response = await recorder.call(
+            "create_user",
+            client.post(
+                "/users/",
+                headers=headers,
+                json={"username": username, "email": f"{username}@example.com", "password": PASSWORD},
+            ),
+        )
+        if response.status_code != 200:
+            return
+        user_id = response.json()["id"]
+        await recorder.call("read_user_admin", client.get(f"/users/{user_id}", headers=headers))
+        await recorder.call(
+            "update_user",
+            client.patch(
+                f"/users/{user_id}", headers=headers, json={"email": f"otro-{username}@example.com"}
+            ),
+        )
+        await recorder.call("delete_user", client.delete(f"/users/{user_id}", headers=headers))
+
+
+SCENARIO_CLASSES = {
+    "login": Login,
+    "refresh": Refresh,
+    "validate_user": ValidateUser,
+    "read_user": ReadUser,
+    "users_crud": UsersCrud,
+}
+
+
+async def run_scenario(
+    make_client: Callable[[], httpx.AsyncClient],
+    scenario: Scenario,
+    concurrency: int,
+    warmup: float,
+    duration: float,
+) -> Dict[str, Dict[str, float]]:
+    recorder = Recorder()
+    ready = asyncio.Event()
+    pending_setups = concurrency
+
+    async def worker(index: int) -> None:
+        nonlocal pending_setups
+        async with make_client() as client:
+            state = await scenario.setup(client, index)
+            pending_setups -= 1
+            if pending_setups == 0:
+                start = time.perf_counter() + warmup
+                recorder.window = (start, start + duration)
+                ready.set()
+            await ready.wait()
+            while time.perf_counter() < recorder.window[1]:
+                await scenario.step(client, state, recorder)
+
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return {
+        name: summarize(samples, duration, recorder.errors[name])
+        for name, samples in recorder.samples.items()
+    }
+
+
+@contextlib.asynccontextmanager
+async def asgi_clients() -> AsyncIterator[Callable[[], httpx.AsyncClient]]:
+    from src.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        yield lambda: httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+
+@contextlib.asynccontextmanager
+async def uvicorn_clients(port: int, workers: int) -> AsyncIterator[Callable[[], httpx.AsyncClient]]:
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "src.main:app",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as probe:
+            for _ in range(300):
+                with contextlib.suppress(httpx.TransportError):
+                    if (await probe.get("/.well-known/jwks.json")).status_code == 200:
+                        break
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn terminó antes de aceptar conexiones")
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn no respondió a tiempo")
+        yield lambda: httpx.AsyncClient(base_url=base_url, timeout=30)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    clients = uvicorn_clients(args.port, args.workers) if args.uvicorn else asgi_clients()
+    results = {}
+    async with clients as make_client:
+        for name in args.scenarios:
+            scenario = SCENARIO_CLASSES[name](args.users, args.concurrency)
+            print(f"{name}...", flush=True)
+            results.update(
+                await run_scenario(
+                    make_client, scenario, args.concurrency, args.warmup, args.duration
+                )
+            )
+    return results
+
+
+def main(args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    seed(args.users)
+    print(f"seed: {args.users:,} usuarios en {time.perf_counter() - start:.1f}s")
+    results = asyncio.run(run(args))
+    print(
+        format_table(
+            ["operación", "requests", "errores", "req/s", "p50 ms", "p95 ms", "p99 ms"],
+            [
+                [
+                    name,
+                    values["requests"],
+                    values["errors"],
+                    f"{values['rps']:.1f}",
+                    f"{values['p50_ms']:.2f}",
+                    f"{values['p95_ms']:.2f}",
+                    f"{values['p99_ms']:.2f}",
+                ]
+                for name, values in results.items()
+            ],
+        )
+    )
+    kind = "load-uvicorn" if args.uvicorn else "load-asgi"
+    if args.compare:
+        baseline = load_results(kind, args.compare)
+        if baseline is None:
+            print("\nNo hay resultados anteriores para comparar")
+        else:
+            print(f"\nComparación con {baseline['created_at']} ({baseline['git']}):")
+            print(compare_table(results, baseline["results"], ["rps", "p50_ms", "p99_ms"]))
+    if args.save:
+        params = {
+            key: getattr(args, key)
+            for key in ("users", "concurrency", "warmup", "duration", "workers", "scenarios")
+        }
+        print(f"\nResultados guardados en {save_results(kind, params, results)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--uvicorn", action="store_true", help="medir contra un servidor uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="workers de uvicorn")
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--compare", help='ruta de un resultado anterior o "latest"')
+    main(parser.parse_args())
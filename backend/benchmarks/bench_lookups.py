@@ -0,0 +1,111 @@
+"""Latencia de las búsquedas por email y por token de recuperación, con y sin índices.
+
+    python -m benchmarks.bench_lookups --rows 1000000
+
+Carga `--rows` usuarios y tokens de recuperación, mide `get_user_by_email` y la
+búsqueda por digest con los índices de los modelos, y luego repite la medición
+sin ellos (equivalente al esquema anterior, que recorría la tabla completa).
+"""
+import argparse
+import random
+import time
+from benchmarks.common import configure_env, format_table
+
+configure_env()
+
+import datetime  # noqa: E402
+from sqlalchemy import func, insert, select, text  # noqa: E402
+from src.auth.models import AuthPasswordRecoveryToken as RecoveryToken  # noqa: E402
+from src.auth.utils import token_digest  # noqa: E402
+from src.database import SessionLocal, engine  # noqa: E402
+from src.monitoring.service import LatencyRecorder  # noqa: E402
+from src.upgrade_db import upgrade  # noqa: E402
+from src.users.models import User  # noqa: E402
+from src.users.utils import get_user_by_email  # noqa: E402
+
+FAKE_HASH = "$argon2id$v=19$m=65536,t=3,p=4$benchmark$benchmark"
+INDEXES = ["ix_user_email_lower", "ix_auth_password_recovery_tokens_token_digest"]
+
+
+def seed(total: int, batch_size: int = 20000) -> None:
+    expires_at = datetime.datetime.now(datetime.UTC) + datetime.timedelta(days=1)
+    with engine.begin() as conn:
+        upgrade(conn)
+        existing = conn.scalar(select(func.count()).select_from(User))
+        for start in range(existing, total, batch_size):
+            ids = range(start, min(start + batch_size, total))
+            conn.execute(
+                insert(User),
+                [
+                    {
+                        "username": f"bench{i}",
+                        "email": f"Bench{i}@example.com",
+                        "hashed_password": FAKE_HASH,
+                    }
+                    for i in ids
+                ],
+            )
+            conn.execute(
+                insert(RecoveryToken),
+                [
+                    {
+                        "email": f"Bench{i}@example.com",
+                        "token_digest": token_digest(f"token{i}"),
+                        "expires_at": expires_at,
+                    }
+                    for i in ids
+                ],
+            )
+
+
+def measure(total: int, lookups: int) -> dict:
+    by_email, by_token = LatencyRecorder(), LatencyRecorder()
+    with SessionLocal() as db:
+        for i in random.sample(range(total), lookups):
+            start = time.perf_counter()
+            get_user_by_email(db, f"bench{i}@EXAMPLE.com")
+            by_email.observe(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            found = db.scalar(
+                select(RecoveryToken).where(
+                    RecoveryToken.token_digest == token_digest(f"token{i}")
+                )
+            )
+            by_token.observe(time.perf_counter() - start)
+            assert found is not None
+            db.expunge_all()
+    return {"email": by_email.summary(), "token": by_token.summary()}
+
+
+def main(total: int, lookups: int, scan_lookups: int) -> None:
+    start = time.perf_counter()
+    seed(total)
+    print(f"seed: {total:,} filas en {time.perf_counter() - start:.1f}s")
+
+    results = [("índices", measure(total, lookups))]
+    with engine.begin() as conn:
+        for name in INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+    try:
+        results.append(("sin índices", measure(total, scan_lookups)))
+    finally:
+        # deja la base como la espera la app
+        with engine.begin() as conn:
+            upgrade(conn)
+
+    rows = [
+        [label, query, summary["count"], f"{summary['p50_ms']:.3f}", f"{summary['p95_ms']:.3f}"]
+        for label, summaries in results
+        for query, summary in summaries.items()
+    ]
+    print(format_table(["esquema", "búsqueda", "n", "p50 ms", "p95 ms"], rows))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--scan-lookups", type=int, default=20)
+    args = parser.parse_args()
+    main(args.rows, args.lookups, args.scan_lookups)
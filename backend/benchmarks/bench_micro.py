@@ -0,0 +1,127 @@
+"""Microbenchmarks de las funciones del camino crítico de autenticación.
+
+    python -m benchmarks.bench_micro --save --compare latest
+
+Mide `encode_token`, `create_access_token`, la decodificación de JWT con cada
+algoritmo soportado por los key rings (HS256, RS256, ES256, EdDSA), el camino
+cacheado de `token_cache` y la serialización de los schemas de usuario. Con
+`--save` guarda los resultados en `benchmarks/results`; con `--compare` muestra
+la variación respecto de un resultado anterior.
+"""
+import argparse
+import timeit
+from typing import Callable, Dict, List
+from benchmarks.common import (
+    compare_table,
+    configure_env,
+    format_table,
+    load_results,
+    save_results,
+)
+
+configure_env()
+
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from src.auth.cache import TokenCache  # noqa: E402
+from src.auth.claims import claim_codec  # noqa: E402
+from src.auth.keys import KeyRing, SigningKey, access_keys  # noqa: E402
+from src.auth.utils import create_access_token, encode_token  # noqa: E402
+from src.users import schemas as users_schemas  # noqa: E402
+from src.users.models import Role, User  # noqa: E402
+
+
+def _key_ring(algorithm: str, private_key) -> KeyRing:
+    ring = KeyRing(algorithm)
+    ring.replace([SigningKey("bench", algorithm, private_key, private_key.public_key())])
+    return ring
+
+
+def _sample_user(user_id: int = 123456) -> User:
+    role = Role(id=3, name="secretaria_academica")
+    return User(
+        id=user_id,
+        username=f"usuario{user_id}",
+        email=f"usuario{user_id}@example.com",
+        hashed_password="x",
+        token_version=0,
+        role_id=role.id,
+        role=role,
+    )
+
+
+def cases() -> Dict[str, Callable[[], object]]:
+    user = _sample_user()
+    claims = claim_codec.encode(user.id, user.role_id, user.token_version)
+    token = encode_token(claims)
+    rings = {
+        "RS256": _key_ring("RS256", rsa.generate_private_key(65537, 2048)),
+        "ES256": _key_ring("ES256", ec.generate_private_key(ec.SECP256R1())),
+        "EdDSA": _key_ring("EdDSA", ed25519.Ed25519PrivateKey.generate()),
+    }
+    cache = TokenCache(max_size=1000)
+    cache.put(token, access_keys.decode(token), user)
+    users = [_sample_user(i) for i in range(100)]
+    user_list = TypeAdapter(List[users_schemas.User])
+
+    benchmarks = {
+        "encode_token HS256": lambda: encode_token(claims),
+        "create_access_token": lambda: create_access_token(user),
+        "decode HS256": lambda: access_keys.decode(token),
+        "decode HS256 + claims": lambda: claim_codec.decode(access_keys.decode(token)),
+        "token_cache.get (hit)": lambda: cache.get(token),
+        "User schema dump_json": lambda: (
+            users_schemas.User.model_validate(user).model_dump_json()
+        ),
+        "100 User dump_json": lambda: user_list.dump_json(
+            user_list.validate_python(users, from_attributes=True)
+        ),
+    }
+    for algorithm, ring in rings.items():
+        signed = ring.encode({**claims, "exp": 4102444800})
+        benchmarks[f"encode {algorithm}"] = lambda ring=ring: ring.encode(claims)
+        benchmarks[f"decode {algorithm}"] = lambda ring=ring, signed=signed: ring.decode(signed)
+    return benchmarks
+
+
+def measure(fn: Callable[[], object], min_time: float, repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    # el mínimo de las repeticiones es el menos afectado por el ruido del host
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return {"us_per_op": best * 1e6, "ops_per_s": 1 / best}
+
+
+def main(min_time: float, repeat: int, save: bool, compare: str) -> None:
+    results = {name: measure(fn, min_time, repeat) for name, fn in cases().items()}
+    print(
+        format_table(
+            ["caso", "µs/op", "ops/s"],
+            [
+                [name, f"{values['us_per_op']:.2f}", f"{values['ops_per_s']:,.0f}"]
+                for name, values in results.items()
+            ],
+        )
+    )
+    if compare:
+        baseline = load_results("micro", compare)
+        if baseline is None:
+            print("\nNo hay resultados anteriores para comparar")
+        else:
+            print(f"\nComparación con {baseline['created_at']} ({baseline['git']}):")
+            print(compare_table(results, baseline["results"], ["us_per_op"]))
+    if save:
+        print(f"\nResultados guardados en {save_results('micro', {'repeat': repeat}, results)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--min-time", type=float, default=0.2, help="segundos por repetición")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--compare", help='ruta de un resultado anterior o "latest"')
+    args = parser.parse_args()
+    main(args.min_time, args.repeat, args.save, args.compare)
@@ -0,0 +1,188 @@
+"""Utilidades compartidas por los benchmarks.
+
+Los benchmarks se ejecutan desde el directorio `backend`, por ejemplo:
+    python -m benchmarks.bench_export
+"""
+import asyncio
+import datetime
+import glob
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+BENCH_ENV = {
+    "ENV": "BENCH",
+    "ROOT_PATH": "",
+    "ALGORITHM": "HS256",
+    "SECRET_KEY": "bench-secret",
+    "REFRESH_SECRET_KEY": "bench-refresh-secret",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "15",
+    "REFRESH_TOKEN_EXPIRE_DAYS": "7",
+    "TOKEN_URL": "/auth/token",
+    "REFRESH_TOKEN_COOKIE_NAME": "refresh_token",
+    "ACCESS_TOKEN_COOKIE_NAME": "access_token",
+}
+
+
+def configure_env(db_url: str = None) -> str:
+    """Configura las variables de entorno que lee `src.settings`.
+
+    Debe llamarse antes de importar cualquier módulo de `src`. Si no se indica
+    `db_url`, se usa una base SQLite temporal.
+    """
+    if db_url is None:
+        db_url = f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ["DB_URL"] = db_url
+    return db_url
+
+
+async def call_asgi(app, method: str, path: str, query: str = "") -> Tuple[int, int]:
+    """Ejecuta un request contra la app ASGI descartando el body a medida que llega
+    (a diferencia de httpx.ASGITransport, que lo acumula en memoria).
+    Devuelve el status y la cantidad de bytes recibidos.
+    """
+    status, received = 0, 0
+    scope: Dict[str, Any] = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+
+    request_sent = False
+    response_complete = asyncio.Event()
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # el cliente no se desconecta hasta recibir la respuesta completa
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status, received
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    await app(scope, receive, send)
+    return status, received
+
+
+def format_table(headers: List[str], rows: List[List[Any]]) -> str:
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    lines = [
+        "  ".join(str(value).rjust(width) for value, width in zip(row, widths))
+        for row in [headers, *rows]
+    ]
+    return "\n".join(lines)
+
+
+def percentile(sorted_samples: Sequence[float], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def summarize(samples: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    """Throughput y percentiles (en ms) de una lista de latencias en segundos."""
+    ordered = sorted(samples)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": len(ordered) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(
+    kind: str, params: Dict[str, Any], results: Dict[str, Dict[str, float]]
+) -> str:
+    """Guarda los resultados en `benchmarks/results/<kind>-<fecha>.json` junto con
+    la revisión de git y el entorno, y devuelve la ruta del archivo.
+    """
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    now = datetime.datetime.now(datetime.UTC)
+    path = os.path.join(RESULTS_DIR, f"{kind}-{now:%Y%m%dT%H%M%S}.json")
+    document = {
+        "kind": kind,
+        "created_at": now.isoformat(),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+    return path
+
+
+def load_results(kind: str, reference: str) -> Optional[Dict[str, Any]]:
+    """Carga un resultado guardado: una ruta, o "latest" para el último de `kind`."""
+    if reference == "latest":
+        paths = sorted(glob.glob(os.path.join(RESULTS_DIR, f"{kind}-*.json")))
+        if not paths:
+            return None
+        reference = paths[-1]
+    with open(reference) as file:
+        return json.load(file)
+
+
+def compare_table(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    metrics: List[str],
+) -> str:
+    """Tabla con la variación porcentual de cada métrica respecto de `baseline`."""
+    rows = []
+    for name, values in current.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        row = [name]
+        for metric in metrics:
+            before, after = previous.get(metric), values.get(metric)
+            if not before or after is None:
+                row.append("-")
+            else:
+                row.append(f"{before:.2f} -> {after:.2f} ({(after - before) / before * 100:+.1f}%)")
+        rows.append(row)
+    return format_table(["caso", *metrics], rows)
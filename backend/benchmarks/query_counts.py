@@ -0,0 +1,84 @@
+"""Cuenta las sentencias SQL que ejecuta cada endpoint de escritura de usuarios
+y verifica que no superen el máximo esperado.
+
+    python -m benchmarks.query_counts
+
+Sale con código 1 si algún endpoint ejecuta más sentencias de las previstas.
+"""
+import asyncio
+import sys
+from contextlib import contextmanager
+
+from benchmarks.common import configure_env
+
+configure_env()
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from src.database import engine  # noqa: E402
+
+# (método, path, kwargs, status esperado, máximo de sentencias)
+CASES = [
+    # UPDATE ... RETURNING + carga del rol si no está en el identity map
+    ("PATCH", "/users/{user_id}", {"json": {"email": "otro@example.com"}}, 200, 2),
+    ("PATCH", "/users/{user_id}", {"json": {"username": "admin"}}, 400, 1),
+    ("PATCH", "/users/999999", {"json": {"email": "x@example.com"}}, 404, 1),
+    ("PATCH", "/users/{user_id}/role", {"params": {"role_id": 3}}, 200, 2),
+    ("PATCH", "/users/{user_id}/role", {"params": {"role_id": 999}}, 404, 2),
+    ("PATCH", "/users/999999/role", {"params": {"role_id": 1}}, 404, 2),
+    ("DELETE", "/users/{user_id}", {}, 200, 1),
+    ("DELETE", "/users/{user_id}", {}, 404, 1),
+]
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def main() -> int:
+    from src.load_data import main as load_data
+    from src.main import app
+
+    asyncio.run(load_data())
+    failures = 0
+    with TestClient(app) as client:
+        token = client.post(
+            "/auth/token", data={"username": "admin", "password": "123456789"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        user_id = client.post(
+            "/auth/register",
+            json={"username": "conteo", "email": "conteo@example.com", "password": "abcdefghij"},
+        ).json()["id"]
+        # calienta el cache de tokens para medir sólo las sentencias del endpoint
+        client.get("/auth/validate-user", headers=headers)
+
+        for method, path, kwargs, status, limit in CASES:
+            path = path.format(user_id=user_id)
+            with count_statements() as statements:
+                response = client.request(method, path, headers=headers, **kwargs)
+            ok = response.status_code == status and len(statements) <= limit
+            failures += not ok
+            print(
+                f"{'ok ' if ok else 'ERR'} {method:6} {path:24} "
+                f"status={response.status_code} (esperado {status}) "
+                f"sentencias={len(statements)} (máx. {limit})"
+            )
+            if not ok:
+                for statement in statements:
+                    print("      ", " ".join(statement.split())[:120])
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
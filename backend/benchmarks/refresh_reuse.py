@@ -0,0 +1,85 @@
+"""Verifica la rotación de refresh tokens ante reusos del mismo token.
+
+    python -m benchmarks.refresh_reuse
+    DB_ASYNC=true python -m benchmarks.refresh_reuse
+
+Casos: dos refresh concurrentes con la misma cookie (como los que envía el frontend
+cuando dos requests reciben 401 a la vez), un reuso secuencial dentro de
+REFRESH_TOKEN_REUSE_GRACE_SECONDS y un reuso posterior, que debe revocar la familia.
+Sale con código 1 si algún caso no da el status esperado.
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import List, Tuple
+
+from benchmarks.common import configure_env
+
+configure_env()
+os.environ.setdefault("REFRESH_TOKEN_REUSE_GRACE_SECONDS", "1")
+os.environ.setdefault("LOGIN_RATE_LIMIT_PER_USERNAME", "0")
+os.environ.setdefault("LOGIN_RATE_LIMIT_PER_IP", "0")
+
+import httpx  # noqa: E402
+from src.settings import REFRESH_TOKEN_COOKIE_NAME, REFRESH_TOKEN_REUSE_GRACE_SECONDS  # noqa: E402
+
+
+async def refresh(client: httpx.AsyncClient, token: str) -> httpx.Response:
+    return await client.put(
+        "/auth/token", headers={"Cookie": f"{REFRESH_TOKEN_COOKIE_NAME}={token}"}
+    )
+
+
+async def login(client: httpx.AsyncClient) -> str:
+    response = await client.post(
+        "/auth/token", data={"username": "user", "password": "123456789"}
+    )
+    response.raise_for_status()
+    return response.cookies[REFRESH_TOKEN_COOKIE_NAME]
+
+
+async def run() -> List[Tuple[str, List[int], List[int]]]:
+    from src.load_data import main as load_data
+    from src.main import app
+
+    await load_data()
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="https://bench") as client:
+            token = await login(client)
+            first, second = await asyncio.gather(refresh(client, token), refresh(client, token))
+            results.append(
+                ("refresh concurrentes", [first.status_code, second.status_code], [200, 200])
+            )
+            successors = [
+                response.cookies.get(REFRESH_TOKEN_COOKIE_NAME) for response in (first, second)
+            ]
+
+            response = await refresh(client, token)
+            results.append(("reuso dentro de la tolerancia", [response.status_code], [200]))
+
+            await asyncio.sleep(REFRESH_TOKEN_REUSE_GRACE_SECONDS + 0.2)
+            late = await refresh(client, token)
+            # el reuso tardío revoca la familia, incluidos los sucesores ya emitidos
+            revoked = [(await refresh(client, successor)).status_code for successor in successors]
+            results.append(("reuso fuera de la tolerancia", [late.status_code], [401]))
+            results.append(("familia revocada", revoked, [401, 401]))
+    return results
+
+
+def main() -> int:
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    failures = 0
+    for name, statuses, expected in results:
+        ok = statuses == expected
+        failures += not ok
+        print(f"{'ok ' if ok else 'ERR'} {name:32} status={statuses} (esperado {expected})")
+    print(f"{time.perf_counter() - start:.1f}s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
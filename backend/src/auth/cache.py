@@ -0,0 +1,180 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Set
+from src.database import detached_copy
+from src.settings import TOKEN_CACHE_MAX_SIZE
+from src.monitoring.service import register_collector
+
+
+class CachedToken(NamedTuple):
+    claims: Dict[str, Any]
+    user: Any  # copia desacoplada de users.models.User
+    user_id: int
+    expires_at: float
+
+
+class TokenCache:
+    """Cache LRU de access tokens ya verificados.
+
+    Las entradas se indexan por el digest SHA-256 del token y viven hasta el `exp`
+    del mismo o hasta que se invaliden explícitamente los tokens del usuario.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, CachedToken]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[bytes]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def _discard(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry.user_id]
+
+    def get(self, token: str) -> Optional[CachedToken]:
+        if self.max_size <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.time():
+                self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, token: str, claims: Dict[str, Any], user: Any) -> None:
+        expires_at = claims.get("exp")
+        if self.max_size <= 0 or expires_at is None:
+            return
+        entry = CachedToken(claims, detached_copy(user), user.id, float(expires_at))
+        key = self._key(token)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = entry
+            self._keys_by_user.setdefault(entry.user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Descarta todos los tokens cacheados del usuario (p. ej. tras modificarlo)."""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._discard(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+token_cache = TokenCache(max_size=TOKEN_CACHE_MAX_SIZE)
+register_collector("token_cache", token_cache.stats)
+
+
+class TokenVersionCache:
+    """Última `token_version` conocida de cada usuario (LRU), para rechazar con una
+    comparación de enteros los tokens emitidos antes de un cambio de credenciales.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._versions: "OrderedDict[int, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stale = 0
+
+    def set(self, user_id: int, version: int) -> None:
+        with self._lock:
+            self._versions[user_id] = version
+            self._versions.move_to_end(user_id)
+            while len(self._versions) > self.max_size:
+                self._versions.popitem(last=False)
+
+    def is_current(self, user_id: int, version: int, known: int) -> bool:
+        """Compara `version` con la última conocida (o con `known` si el usuario no
+        está en el cache).
+        """
+        current = self._versions.get(user_id, known)
+        if version == current:
+            return True
+        self.stale += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._versions), "max_size": self.max_size, "stale": self.stale}
+
+
+class Denylist:
+    """Digests de jti revocados, con la expiración del token correspondiente.
+
+    Se consulta en cada refresh antes de tocar la DB; las entradas se descartan
+    una vez vencido el token, porque a partir de ahí el JWT ya no es válido.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def add(self, digest: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[digest] = expires_at
+
+    def __contains__(self, digest: str) -> bool:
+        expires_at = self._entries.get(digest)
+        if expires_at is None or expires_at <= time.time():
+            return False
+        self.hits += 1
+        return True
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [digest for digest, expires_at in self._entries.items() if expires_at <= now]
+            for digest in expired:
+                del self._entries[digest]
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._entries), "hits": self.hits}
+
+
+refresh_denylist = Denylist()
+register_collector("refresh_denylist", refresh_denylist.stats)
+
+token_versions = TokenVersionCache(max_size=max(TOKEN_CACHE_MAX_SIZE, 1))
+register_collector("token_versions", token_versions.stats)
@@ -0,0 +1,147 @@
+"""Calibración de los parámetros de Argon2id para el host actual.
+
+    python -m src.auth.calibrate --target-p99-ms 250 --cores 4
+
+Cada hash usa `parallelism` hilos, por lo que con un presupuesto de `--cores` núcleos
+se ejecutan `cores // parallelism` verificaciones simultáneas (una por proceso, como
+con HASHING_EXECUTOR="process"). Para cada costo de memoria se aumenta el costo de
+tiempo mientras el p99 de la verificación bajo esa concurrencia no supere el
+objetivo, y se propone la combinación más costosa que lo cumple junto con el
+throughput de logins estimado.
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+from pwdlib.hashers.argon2 import Argon2Hasher
+from src.monitoring.service import LatencyRecorder
+from src.settings import (
+    ARGON2_MEMORY_COST,
+    ARGON2_PARALLELISM,
+    ARGON2_TIME_COST,
+    HASHING_MAX_WORKERS,
+)
+
+# KiB; 19456 (19 MiB) es el mínimo recomendado por OWASP para Argon2id
+MEMORY_COSTS = (19456, 32768, 47104, 65536, 131072, 262144)
+MAX_TIME_COST = 10
+PASSWORD = "calibracion-argon2"
+
+
+class Params(NamedTuple):
+    time_cost: int
+    memory_cost: int
+    parallelism: int
+
+    @property
+    def cost(self) -> int:
+        return self.time_cost * self.memory_cost
+
+
+class Measurement(NamedTuple):
+    params: Params
+    p50_ms: float
+    p99_ms: float
+    logins_per_second: float
+
+
+def _timed_verify(params: Params, hashed_password: str) -> float:
+    hasher = Argon2Hasher(*params)
+    start = time.perf_counter()
+    hasher.verify(PASSWORD, hashed_password)
+    return time.perf_counter() - start
+
+
+def measure(
+    pool: ProcessPoolExecutor, params: Params, concurrency: int, samples: int
+) -> Measurement:
+    hashed_password = Argon2Hasher(*params).hash(PASSWORD)
+    # una ronda previa para que cada proceso reserve la memoria antes de medir
+    list(pool.map(_timed_verify, [params] * concurrency, [hashed_password] * concurrency))
+    latency = LatencyRecorder(window=samples)
+    for duration in pool.map(_timed_verify, [params] * samples, [hashed_password] * samples):
+        latency.observe(duration)
+    summary = latency.summary()
+    return Measurement(
+        params,
+        summary["p50_ms"],
+        summary["p99_ms"],
+        concurrency * 1000 / summary["avg_ms"],
+    )
+
+
+def calibrate(
+    target_p99_ms: float, cores: int, parallelism: int, samples: int
+) -> List[Measurement]:
+    concurrency = max(1, cores // parallelism)
+    measurements = []
+    with ProcessPoolExecutor(max_workers=concurrency) as pool:
+        for memory_cost in MEMORY_COSTS:
+            fitted = False
+            for time_cost in range(1, MAX_TIME_COST + 1):
+                measurement = measure(
+                    pool, Params(time_cost, memory_cost, parallelism), concurrency, samples
+                )
+                measurements.append(measurement)
+                print(_format(measurement), flush=True)
+                if measurement.p99_ms > target_p99_ms:
+                    break
+                fitted = True
+            if not fitted:
+                # con más memoria tampoco se alcanzará el objetivo
+                break
+    return measurements
+
+
+def _format(measurement: Measurement) -> str:
+    params = measurement.params
+    return (
+        f"t={params.time_cost:<2} m={params.memory_cost:<7} p={params.parallelism:<2} "
+        f"p50={measurement.p50_ms:8.1f} ms  p99={measurement.p99_ms:8.1f} ms  "
+        f"{measurement.logins_per_second:8.1f} logins/s"
+    )
+
+
+def propose(measurements: List[Measurement], target_p99_ms: float) -> Optional[Measurement]:
+    fitting = [m for m in measurements if m.p99_ms <= target_p99_ms]
+    if not fitting:
+        return None
+    return max(fitting, key=lambda m: (m.params.cost, -m.p99_ms))
+
+
+def main(target_p99_ms: float, cores: int, parallelism: int, samples: int) -> None:
+    current = Params(ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM)
+    print(
+        f"Objetivo: p99 <= {target_p99_ms:.0f} ms con {cores} núcleos "
+        f"({max(1, cores // parallelism)} verificaciones simultáneas)"
+    )
+    measurements = calibrate(target_p99_ms, cores, parallelism, samples)
+    if current not in [m.params for m in measurements]:
+        concurrency = max(1, cores // current.parallelism)
+        with ProcessPoolExecutor(max_workers=concurrency) as pool:
+            measurements.append(measure(pool, current, concurrency, samples))
+    by_params: Dict[Params, Measurement] = {m.params: m for m in measurements}
+    print(f"\nParámetros actuales: {_format(by_params[current])}")
+
+    proposal = propose(measurements, target_p99_ms)
+    if proposal is None:
+        print("Ninguna combinación cumple el objetivo; aumentar el p99 objetivo o los núcleos.")
+        return
+    print(f"Propuesta:           {_format(proposal)}\n")
+    print(f"ARGON2_TIME_COST={proposal.params.time_cost}")
+    print(f"ARGON2_MEMORY_COST={proposal.params.memory_cost}")
+    print(f"ARGON2_PARALLELISM={proposal.params.parallelism}")
+    print('HASHING_EXECUTOR="process"')
+    print(f"HASHING_MAX_WORKERS={max(1, cores // proposal.params.parallelism)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--target-p99-ms", type=float, default=250)
+    parser.add_argument("--cores", type=int, default=HASHING_MAX_WORKERS)
+    parser.add_argument("--parallelism", type=int, default=1)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+    main(args.target_p99_ms, args.cores, args.parallelism, args.samples)
@@ -0,0 +1,56 @@
+from typing import Any, Dict, NamedTuple, Optional
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from src.auth import exceptions
+from src.settings import ACCEPT_LEGACY_TOKENS
+
+# Versión del formato compacto. Los tokens sin claim "v" son del formato anterior,
+# con el schema User completo serializado como JSON dentro de "sub".
+CLAIMS_VERSION = 1
+
+
+class AccessClaims(NamedTuple):
+    user_id: int
+    role_id: Optional[int]
+    token_version: int
+    version: int
+
+
+class _LegacySubject(BaseModel):
+    id: int
+    role_id: Optional[int] = None
+
+
+class ClaimCodec:
+    """Codifica y decodifica los claims propios de los tokens de acceso y refresh.
+
+    Formato v1: {"v": 1, "sub": "<id>", "rid": <role_id>, "tv": <token_version>}; un
+    payload sin "sub" o "tv" (p. ej. un token de recuperación) se rechaza.
+    Si `accept_legacy` es True también se aceptan los tokens emitidos con el
+    formato anterior, validando sólo los campos necesarios del JSON de "sub".
+    """
+
+    def __init__(self, accept_legacy: bool = True) -> None:
+        self.accept_legacy = accept_legacy
+        # el validador se construye una sola vez y se reutiliza en cada request
+        self._legacy_adapter = TypeAdapter(_LegacySubject)
+
+    @staticmethod
+    def encode(user_id: int, role_id: Optional[int], token_version: int = 0) -> Dict[str, Any]:
+        return {"v": CLAIMS_VERSION, "sub": str(user_id), "rid": role_id, "tv": token_version}
+
+    def decode(self, payload: Dict[str, Any]) -> AccessClaims:
+        version = payload.get("v")
+        try:
+            if version == CLAIMS_VERSION:
+                return AccessClaims(
+                    int(payload["sub"]), payload.get("rid"), int(payload["tv"]), version
+                )
+            if version is None and self.accept_legacy and "sub" in payload:
+                subject = self._legacy_adapter.validate_json(payload["sub"])
+                return AccessClaims(subject.id, subject.role_id, 0, 0)
+        except (KeyError, TypeError, ValueError, ValidationError):
+            pass
+        raise exceptions.InvalidCredentials()
+
+
+claim_codec = ClaimCodec(accept_legacy=ACCEPT_LEGACY_TOKENS)
@@ -7,10 +7,24 @@ class ErrorCode:
     AUTHORIZATION_FAILED = "La autorización ha fallado. El usuario no tiene acceso"
     INVALID_TOKEN = "Token inválido"
     INVALID_CREDENTIALS = "Credenciales inválidas"
+    TOKEN_REVOKED = "Tus credenciales cambiaron. Inicia sesión nuevamente."
     REFRESH_TOKEN_NOT_VALID = "Tu sesión ha caducado. Inicia sesión nuevamente."
     REFRESH_TOKEN_REQUIRED = "El refresh token es requerido en el body o en las cookies"
     INVALID_PASSWORD_TOKEN = "El token para actualizcación de password es inválido"
     EMAIL_AUTHENTICATION_REQUIRED = "Ha ocurrido un problema con la autenticación de la cuenta de email del servidor."
+    HASHING_POOL_SATURATED = "El servidor está procesando demasiadas solicitudes. Intenta nuevamente en unos segundos."
+    BULK_HASHING_BUSY = "Ya hay una importación de usuarios en curso. Intenta nuevamente cuando termine."
+
+
+class PasswordRecovery:
+    # audiencia de los tokens de recuperación: se firman con las claves de acceso,
+    # pero `jwt.decode` los rechaza donde no se espera esta audiencia
+    AUDIENCE = "password-recovery"
+
+
+class Introspection:
+    # cantidad máxima de tokens por request de POST /auth/introspect
+    MAX_TOKENS = 100
 
 
 class Message:
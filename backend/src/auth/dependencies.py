@@ -1,30 +1,33 @@
-import jwt
 from datetime import datetime
 from fastapi import Depends, Request
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from jwt.exceptions import (
     InvalidTokenError,
     ExpiredSignatureError,
 )
-from src.database import get_db
+from src.database import get_db, run_db, sync_session
 from src.settings import (
-    REFRESH_SECRET_KEY,
     REFRESH_TOKEN_COOKIE_NAME,
     TOKEN_URL,
-    SECRET_KEY,
-    ALGORITHM)
-from src.auth.schemas import TokenData
-from src.auth.utils import _is_valid_refresh_token
+)
+from src.auth.claims import AccessClaims, claim_codec
+from src.auth.utils import _is_valid_refresh_token, token_digest
+from src.auth.cache import refresh_denylist, token_cache, token_versions
+from src.auth.keys import access_keys, refresh_keys
 from src.auth import exceptions, constants
 from src.users import service as users_service
-from src.users import models as users_models
+from src.users.roles import role_registry
+from src.ratelimit.service import login_limiter
+from src.ratelimit.exceptions import LoginRateLimited
+from src.monitoring.tracing import traced
 from src.users import schemas as users_schemas
+from src.users import exceptions as users_exceptions
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=TOKEN_URL)
 
 
+@traced("dependency.get_token_from_cookie")
 def get_token_from_cookie(request: Request) -> str:
     """
     Obtiene el JWT desde la cookie.
@@ -35,48 +38,70 @@ def get_token_from_cookie(request: Request) -> str:
         raise exceptions.RefreshTokenNotValid()
     return token
 
-async def get_refresh_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(get_token_from_cookie),    
-):
-    """Obtiene el objeto User (DB) que está asociado al refresh token."""
+@traced("dependency.get_refresh_token_payload")
+def get_refresh_token_payload(token: str = Depends(get_token_from_cookie)) -> dict:
+    """Verifica el refresh token de la cookie y devuelve sus claims.
+    Los tokens revocados se rechazan desde `refresh_denylist`, sin consultar la DB.
+    """
     try:
-        payload = jwt.decode(token, REFRESH_SECRET_KEY, algorithms=[ALGORITHM])
+        payload = refresh_keys.decode(token)
         expires_at = datetime.fromtimestamp(payload.get("exp"))
         if not _is_valid_refresh_token(expires_at):
             raise exceptions.RefreshTokenNotValid()
-        else:
-            user_str = payload.get("sub")
-            if user_str is None:
-                raise exceptions.InvalidCredentials()
-            user = users_schemas.User.model_validate_json(user_str)
-            token_data = TokenData(username=user.username)
     except InvalidTokenError as e:
         raise exceptions.RefreshTokenNotValid()
-    user = users_service.get_user_by_username(db, username=token_data.username)
-    if user is None:
+    jti = payload.get("jti")
+    if jti is not None and token_digest(jti) in refresh_denylist:
+        raise exceptions.RefreshTokenNotValid()
+    return payload
+
+
+@traced("dependency.get_refresh_user")
+async def get_refresh_user(
+    db: Session = Depends(get_db),
+    payload: dict = Depends(get_refresh_token_payload),
+):
+    """Obtiene el objeto User (DB) que está asociado al refresh token."""
+    return await _get_token_user(db, claim_codec.decode(payload))
+
+
+async def _get_token_user(db: Session, claims: AccessClaims):
+    try:
+        user = await run_db(db, users_service.get_user, claims.user_id)
+    except users_exceptions.UserNotFound:
         raise exceptions.InvalidCredentials()
+    token_versions.set(user.id, user.token_version)
+    if claims.token_version != user.token_version:
+        raise exceptions.TokenRevoked()
     return user
 
+
+@traced("dependency.get_current_user")
 async def get_current_user(
     db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme),
 ):
-    """Obtiene el objeto User (DB) que está asociado al access token."""
+    """Obtiene el objeto User (DB) que está asociado al access token.
+    Los tokens ya verificados se resuelven desde `token_cache` sin decodificar
+    el JWT ni consultar la DB.
+    """
+    cached = token_cache.get(token)
+    if cached is not None:
+        version = claim_codec.decode(cached.claims).token_version
+        if not token_versions.is_current(cached.user_id, version, cached.user.token_version):
+            raise exceptions.TokenRevoked()
+        return sync_session(db).merge(cached.user, load=False)
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_str = payload.get("sub")
-        if user_str is None:
-            raise exceptions.InvalidCredentials()
-        user = users_schemas.User.model_validate_json(user_str)
-        token_data = TokenData(username=user.username)
+        payload = access_keys.decode(token)
     except ExpiredSignatureError:
         raise exceptions.NotAuthenticated()
-    user = users_service.get_user_by_username(db, username=token_data.username)
-    if user is None:
+    except InvalidTokenError:
         raise exceptions.InvalidCredentials()
+    user = await _get_token_user(db, claim_codec.decode(payload))
+    token_cache.put(token, payload, user)
     return user
 
+@traced("dependency.has_role")
 async def has_role(
     role_name: str,
     db: Session = Depends(get_db),
@@ -84,16 +109,16 @@ async def has_role(
 ) -> users_schemas.User:
     """Verifica que un usuario tenga un rol con el nombre indicado por `role_name`.
     Si es así, devuelve el objeto User.
-    Caso contrario, lanza una excepción PermissionDenied().
+    Caso contrario, lanza una excepción AuthorizationFailed().
+    El id del rol se obtiene de `role_registry`, sin consultar la DB.
     """
-    role = db.scalar(
-        select(users_models.Role).where(users_models.Role.name == role_name)
-    )
-    if role and user.role_id == role.id:
+    role_id = role_registry.get_id(role_name)
+    if role_id is not None and user.role_id == role_id:
         return user
-    raise exceptions.PermissionDenied()
+    raise exceptions.AuthorizationFailed()
 
 
+@traced("dependency.has_admin_role")
 async def has_admin_role(
     db: Session = Depends(get_db),
     user: users_schemas.User = Depends(get_current_user),
@@ -102,6 +127,7 @@ async def has_admin_role(
     return await has_role("admin", db, user)
 
 
+@traced("dependency.has_access_to_user")
 async def has_access_to_user(
     user_id: int,
     auth_user: users_schemas.User = Depends(get_current_user),
@@ -112,4 +138,22 @@ async def has_access_to_user(
 
     if auth_user.is_admin or int(user_id) == auth_user.id:
         return user_id
-    raise exceptions.PermissionDenied()
+    raise exceptions.AuthorizationFailed()
+
+
+@traced("dependency.check_login_rate_limit")
+async def check_login_rate_limit(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+) -> None:
+    """Rechaza con 429 (y Retry-After) los intentos de login que superan los límites
+    por usuario o por IP, antes de consultar la DB o verificar la contraseña.
+    """
+    retry_after = await login_limiter.hit(
+        {
+            "ip": request.client.host if request.client else None,
+            "username": form_data.username.lower(),
+        }
+    )
+    if retry_after is not None:
+        raise LoginRateLimited(retry_after)
@@ -1,5 +1,5 @@
 from src.auth.constants import ErrorCode
-from src.exceptions import BadRequest, NotAuthenticated
+from src.exceptions import BadRequest, NotAuthenticated, PermissionDenied, ServiceUnavailable
 
 
 class IncorrectUserOrPassword(BadRequest):
@@ -10,6 +10,14 @@ class InvalidCredentials(NotAuthenticated):
     DETAIL = ErrorCode.AUTHENTICATION_REQUIRED
 
 
+class AuthorizationFailed(PermissionDenied):
+    DETAIL = ErrorCode.AUTHORIZATION_FAILED
+
+
+class TokenRevoked(NotAuthenticated):
+    DETAIL = ErrorCode.TOKEN_REVOKED
+
+
 class RefreshTokenNotValid(NotAuthenticated):
     DETAIL = ErrorCode.REFRESH_TOKEN_NOT_VALID
 
@@ -20,3 +28,11 @@ class InvalidPasswordUpdateToken(NotAuthenticated):
 
 class InvalidEmailCredentials(NotAuthenticated):
     DETAIL = ErrorCode.EMAIL_AUTHENTICATION_REQUIRED
+
+
+class HashingPoolSaturated(ServiceUnavailable):
+    DETAIL = ErrorCode.HASHING_POOL_SATURATED
+
+
+class BulkHashingBusy(ServiceUnavailable):
+    DETAIL = ErrorCode.BULK_HASHING_BUSY
@@ -0,0 +1,245 @@
+import asyncio
+import multiprocessing
+import secrets
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+from src.settings import (
+    ARGON2_MEMORY_COST,
+    ARGON2_PARALLELISM,
+    ARGON2_TIME_COST,
+    HASHING_EXECUTOR,
+    HASHING_MAX_WORKERS,
+    HASHING_MAX_QUEUE,
+    BULK_IMPORT_HASH_WORKERS,
+)
+from src.auth import exceptions
+from src.monitoring.service import LatencyRecorder, register_collector
+from src.monitoring.tracing import span
+
+password_hash = PasswordHash(
+    (
+        Argon2Hasher(
+            time_cost=ARGON2_TIME_COST,
+            memory_cost=ARGON2_MEMORY_COST,
+            parallelism=ARGON2_PARALLELISM,
+        ),
+    )
+)
+
+
+# Las funciones que se ejecutan en el pool deben estar definidas a nivel de módulo
+# para que puedan serializarse cuando el pool es de procesos.
+def hash_password(password: str) -> str:
+    return password_hash.hash(password)
+
+
+def verify_hash(password: str, hashed_password: str) -> bool:
+    return password_hash.verify(password, hashed_password)
+
+
+def verify_hash_and_check(password: str, hashed_password: str) -> Tuple[bool, bool]:
+    """Como `PasswordHash.verify_and_update`, pero sin calcular el hash nuevo: devuelve
+    (coincide, requiere rehash) para que el rehash se haga fuera del request.
+    """
+    if not password_hash.verify(password, hashed_password):
+        return False, False
+    return True, password_hash.current_hasher.check_needs_rehash(hashed_password)
+
+
+_dummy_hash: Optional[str] = None
+
+
+def verify_dummy_hash(password: str) -> bool:
+    """Verifica `password` contra un hash descartable con los mismos parámetros que
+    los reales, para que rechazar un usuario inexistente cueste lo mismo que una
+    contraseña incorrecta. El hash se genera una vez por proceso del pool.
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = password_hash.hash(secrets.token_urlsafe(16))
+    password_hash.verify(password, _dummy_hash)
+    return False
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    # los pools se crean desde un servidor con hilos en ejecución, donde "fork" no
+    # es seguro; "forkserver" arranca los procesos desde un proceso limpio
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _timed_call(fn: Callable[..., Any], *args: Any) -> Tuple[float, Any]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+class HashingExecutor:
+    """Pool acotado para ejecutar Argon2 fuera del event loop.
+
+    Acepta a lo sumo `max_workers + max_queue` tareas en curso; por encima de ese
+    límite rechaza inmediatamente con HashingPoolSaturated (503) en lugar de encolar.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 1, max_queue: int = 0):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Tipo de executor inválido: {kind}")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.hash_latency = LatencyRecorder()
+        self.queue_wait = LatencyRecorder()
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=_process_context()
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="hashing"
+                    )
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise exceptions.HashingPoolSaturated()
+            self._in_flight += 1
+        executor = self._get_executor()
+        submitted_at = time.perf_counter()
+        try:
+            with span("password.hash", function=fn.__name__):
+                duration, result = await asyncio.get_running_loop().run_in_executor(
+                    executor, _timed_call, fn, *args
+                )
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        self.hash_latency.observe(duration)
+        self.queue_wait.observe(max(0.0, time.perf_counter() - submitted_at - duration))
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight, rejected = self._in_flight, self._rejected
+        return {
+            "executor": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.max_workers),
+            "rejected": rejected,
+            "hash_latency": self.hash_latency.summary(),
+            "queue_wait": self.queue_wait.summary(),
+        }
+
+
+hashing_executor = HashingExecutor(
+    kind=HASHING_EXECUTOR,
+    max_workers=HASHING_MAX_WORKERS,
+    max_queue=HASHING_MAX_QUEUE,
+)
+register_collector("hashing", hashing_executor.stats)
+
+
+def _hash_chunk(passwords: List[str]) -> List[str]:
+    return [hash_password(password) for password in passwords]
+
+
+class BulkHasher:
+    """Pool de procesos compartido para hashear los lotes de las importaciones masivas.
+
+    El pool se crea una sola vez (al primer uso) con `max_workers` procesos, y se
+    hashea a lo sumo un lote a la vez: si hay una importación en curso, las demás se
+    rechazan con BulkHashingBusy (503). Así el hashing masivo ocupa como máximo
+    `max_workers` núcleos, además de los de `hashing_executor`.
+    """
+
+    def __init__(self, max_workers: int = 1) -> None:
+        self.max_workers = max(1, max_workers)
+        self.hash_latency = LatencyRecorder()
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._busy = False
+        self._hashed = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=_process_context()
+                )
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        if not passwords:
+            return []
+        with self._lock:
+            if self._busy:
+                self._rejected += 1
+                raise exceptions.BulkHashingBusy()
+            self._busy = True
+        try:
+            executor = self._get_executor()
+            loop = asyncio.get_running_loop()
+            size = max(1, -(-len(passwords) // (self.max_workers * 4)))
+            start = time.perf_counter()
+            with span("password.hash", function="hash_many"):
+                chunks = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(executor, _hash_chunk, passwords[i : i + size])
+                        for i in range(0, len(passwords), size)
+                    )
+                )
+            self.hash_latency.observe(time.perf_counter() - start)
+            with self._lock:
+                self._hashed += len(passwords)
+        finally:
+            with self._lock:
+                self._busy = False
+        return [hashed for chunk in chunks for hashed in chunk]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            busy, hashed, rejected = self._busy, self._hashed, self._rejected
+        return {
+            "max_workers": self.max_workers,
+            "busy": busy,
+            "hashed": hashed,
+            "rejected": rejected,
+            "batch_latency": self.hash_latency.summary(),
+        }
+
+
+bulk_hasher = BulkHasher(max_workers=BULK_IMPORT_HASH_WORKERS)
+register_collector("bulk_hashing", bulk_hasher.stats)
+
+
+async def hash_many(passwords: List[str]) -> List[str]:
+    """Hashea un lote de contraseñas en el pool de procesos de `bulk_hasher`."""
+    return await bulk_hasher.hash_many(passwords)
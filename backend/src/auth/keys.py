@@ -0,0 +1,289 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional
+import jwt
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+from jwt.algorithms import get_default_algorithms
+from jwt.exceptions import InvalidTokenError
+from src.settings import (
+    ALGORITHM,
+    JWT_KEYS,
+    JWT_KEYS_FILE,
+    JWT_KEYS_RELOAD_INTERVAL,
+    JWT_PRIVATE_KEY_FILE,
+    REFRESH_SECRET_KEY,
+    SECRET_KEY,
+)
+from src.auth.cache import token_cache
+from src.monitoring.service import register_collector
+from src.monitoring.tracing import span
+from src.scheduler import PeriodicTask, scheduler
+
+# kid asignado a SECRET_KEY / REFRESH_SECRET_KEY y usado para verificar los tokens
+# emitidos antes de que existiera el header "kid".
+DEFAULT_KID = "default"
+
+
+class SigningKey(NamedTuple):
+    kid: str
+    algorithm: str
+    signing_key: Any  # None en las claves asimétricas configuradas sólo para verificar
+    verifying_key: Any
+    not_before: float = 0.0
+    retire_at: Optional[float] = None
+
+    @property
+    def is_asymmetric(self) -> bool:
+        return not self.algorithm.startswith("HS")
+
+    def is_active(self, now: float) -> bool:
+        return self.not_before <= now and not self.is_retired(now)
+
+    def is_retired(self, now: float) -> bool:
+        return self.retire_at is not None and now >= self.retire_at
+
+    def to_jwk(self) -> Dict[str, Any]:
+        jwk = get_default_algorithms()[self.algorithm].to_jwk(self.verifying_key, as_dict=True)
+        jwk.pop("key_ops", None)  # RFC 7517: no combinar "key_ops" con "use"
+        return {**jwk, "kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+
+class JWKS(NamedTuple):
+    body: bytes
+    etag: str
+
+
+class KeyRing:
+    """Claves de firma de un tipo de token, indexadas por `kid`.
+
+    Firma siempre con la clave activa más reciente (mayor `not_before`) y verifica
+    con cualquiera de las activas, de modo que una rotación programada no invalida
+    las sesiones vigentes: las claves anteriores se retiran recién en `retire_at`.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._configured: List[SigningKey] = []
+        self._active: Mapping[str, SigningKey] = MappingProxyType({})
+        self._signing: Optional[SigningKey] = None
+        self._jwks = JWKS(b'{"keys":[]}', "")
+        self._lock = threading.Lock()
+        self.unknown_kid = 0
+
+    def _apply(self, configured: List[SigningKey], now: Optional[float]) -> bool:
+        now = time.time() if now is None else now
+        active = {key.kid: key for key in configured if key.is_active(now)}
+        signers = [key for key in active.values() if key.signing_key is not None]
+        if not signers:
+            # se conserva la configuración anterior
+            raise ValueError(f"No hay claves de firma activas para los tokens de {self.name}")
+        signing = max(signers, key=lambda key: key.not_before)
+        # se publican también las claves programadas, para que los consumidores
+        # ya las tengan en cache cuando empiecen a usarse
+        published = [
+            key.to_jwk() for key in configured if key.is_asymmetric and not key.is_retired(now)
+        ]
+        body = json.dumps({"keys": published}, separators=(",", ":")).encode()
+        jwks = JWKS(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        with self._lock:
+            changed = self._signing is None or signing.kid != self._signing.kid
+            self._configured = configured
+            self._active = MappingProxyType(active)
+            self._signing = signing
+            self._jwks = jwks
+        return changed
+
+    def replace(self, keys: Iterable[SigningKey], now: Optional[float] = None) -> bool:
+        return self._apply(list(keys), now)
+
+    def rotate(self, now: Optional[float] = None) -> bool:
+        """Recalcula las claves activas según su calendario. Devuelve True si cambió
+        la clave de firma.
+        """
+        return self._apply(self._configured, now)
+
+    @property
+    def signing_key(self) -> SigningKey:
+        return self._signing
+
+    @property
+    def jwks(self) -> JWKS:
+        """Claves públicas (JWK Set) de las claves asimétricas no retiradas."""
+        return self._jwks
+
+    def verifying_key(self, kid: Optional[str]) -> SigningKey:
+        key = self._active.get(kid if kid is not None else DEFAULT_KID)
+        if key is None:
+            self.unknown_kid += 1
+            raise InvalidTokenError("kid desconocido")
+        return key
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        key = self._signing
+        return jwt.encode(
+            payload, key.signing_key, algorithm=key.algorithm, headers={"kid": key.kid}
+        )
+
+    def decode(self, token: str, **kwargs: Any) -> Dict[str, Any]:
+        with span("jwt.decode", token_type=self.name):
+            key = self.verifying_key(jwt.get_unverified_header(token).get("kid"))
+            return jwt.decode(token, key.verifying_key, algorithms=[key.algorithm], **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "signing_kid": self._signing.kid if self._signing else None,
+            "active_kids": sorted(self._active),
+            "configured_kids": sorted(key.kid for key in self._configured),
+            "unknown_kid": self.unknown_kid,
+        }
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _read_pem(entry: Dict[str, Any], name: str) -> Optional[bytes]:
+    """Lee una clave PEM indicada en línea (`name`) o como archivo (`<name>_file`)."""
+    if entry.get(name):
+        return entry[name].encode()
+    if entry.get(f"{name}_file"):
+        with open(entry[f"{name}_file"], "rb") as file:
+            return file.read()
+    return None
+
+
+def parse_key(entry: Dict[str, Any]) -> SigningKey:
+    """Convierte una entrada de la configuración en una SigningKey.
+
+    Las claves HMAC (HS*) usan "secret". Las asimétricas (RS*, PS*, ES*, EdDSA)
+    usan "private_key" / "private_key_file" en PEM; con sólo "public_key" /
+    "public_key_file" la clave sirve únicamente para verificar.
+    """
+    algorithm = entry.get("alg", ALGORITHM)
+    if algorithm.startswith("HS"):
+        signing_key = verifying_key = entry["secret"]
+    else:
+        private_pem = _read_pem(entry, "private_key")
+        if private_pem is not None:
+            signing_key = load_pem_private_key(private_pem, password=None)
+            verifying_key = signing_key.public_key()
+        else:
+            signing_key = None
+            verifying_key = load_pem_public_key(_read_pem(entry, "public_key"))
+    return SigningKey(
+        kid=entry["kid"],
+        algorithm=algorithm,
+        signing_key=signing_key,
+        verifying_key=verifying_key,
+        not_before=_timestamp(entry.get("not_before")) or 0.0,
+        retire_at=_timestamp(entry.get("retire_at")),
+    )
+
+
+class KeyStore:
+    """Carga los key rings de access y refresh tokens y los mantiene actualizados.
+
+    Fuentes, en orden de prioridad: el archivo JSON `JWT_KEYS_FILE` (que se vuelve a
+    leer si cambia, sin reiniciar la app), la variable `JWT_KEYS` con el mismo JSON,
+    o las claves de settings con kid "default": SECRET_KEY, o JWT_PRIVATE_KEY_FILE si
+    ALGORITHM es asimétrico, para los access tokens; REFRESH_SECRET_KEY (HMAC) para los
+    refresh tokens, que sólo verifica este servicio. Formato:
+
+        {"access": [{"kid": "2025-06", "secret": "...", "not_before": "2025-06-01T00:00:00+00:00",
+                     "retire_at": "2025-07-01T00:00:00+00:00"}, ...],
+         "refresh": [...]}
+    """
+
+    def __init__(self, path: Optional[str] = None, raw: Optional[str] = None) -> None:
+        self.path = path
+        self.raw = raw
+        self.access = KeyRing("access")
+        self.refresh = KeyRing("refresh")
+        self.reloads = 0
+        self.rotations = 0
+        self.last_loaded_at: Optional[float] = None
+        self._mtime: Optional[float] = None
+
+    def _read_config(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self.path:
+            self._mtime = os.stat(self.path).st_mtime
+            with open(self.path) as file:
+                return json.load(file)
+        if self.raw:
+            return json.loads(self.raw)
+        if ALGORITHM.startswith("HS"):
+            access = {"kid": DEFAULT_KID, "secret": SECRET_KEY}
+            refresh_algorithm = ALGORITHM
+        else:
+            access = {"kid": DEFAULT_KID, "private_key_file": JWT_PRIVATE_KEY_FILE}
+            refresh_algorithm = "HS256"
+        return {
+            "access": [access],
+            "refresh": [
+                {"kid": DEFAULT_KID, "alg": refresh_algorithm, "secret": REFRESH_SECRET_KEY}
+            ],
+        }
+
+    def load(self) -> int:
+        """Carga las claves desde la fuente configurada. Devuelve la cantidad de key
+        rings cuya clave de firma cambió.
+        """
+        config = self._read_config()
+        access = [parse_key(entry) for entry in config["access"]]
+        refresh = [parse_key(entry) for entry in config["refresh"]]
+        rotated = self.access.replace(access) + self.refresh.replace(refresh)
+        self.reloads += 1
+        self.last_loaded_at = time.time()
+        return rotated
+
+    def refresh_keys(self) -> int:
+        """Vuelve a leer el archivo si cambió y aplica el calendario de rotación.
+        Devuelve la cantidad de key rings cuya clave de firma cambió.
+        """
+        if self.path and os.stat(self.path).st_mtime != self._mtime:
+            rotated = self.load()
+        else:
+            rotated = self.access.rotate() + self.refresh.rotate()
+        self.rotations += rotated
+        return rotated
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": "file" if self.path else "env" if self.raw else "settings",
+            "reloads": self.reloads,
+            "rotations": self.rotations,
+            "last_loaded_at": self.last_loaded_at,
+            "access": self.access.stats(),
+            "refresh": self.refresh.stats(),
+        }
+
+
+key_store = KeyStore(path=JWT_KEYS_FILE, raw=JWT_KEYS)
+key_store.load()
+access_keys = key_store.access
+refresh_keys = key_store.refresh
+register_collector("jwt_keys", key_store.stats)
+
+
+async def _refresh_key_store() -> int:
+    active = set(access_keys.stats()["active_kids"])
+    rotated = key_store.refresh_keys()
+    if not active <= set(access_keys.stats()["active_kids"]):
+        # los tokens firmados con una clave retirada no deben seguir resolviéndose desde el cache
+        token_cache.clear()
+    return rotated
+
+
+key_store_reloader = scheduler.add(
+    PeriodicTask("jwt_key_reloader", JWT_KEYS_RELOAD_INTERVAL, _refresh_key_store)
+)
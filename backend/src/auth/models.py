@@ -1,5 +1,6 @@
 from datetime import datetime
-from sqlalchemy import String
+from typing import Optional
+from sqlalchemy import ForeignKey, String
 from sqlalchemy.orm import mapped_column, Mapped
 from src.database import Base
 
@@ -8,6 +9,25 @@ class AuthPasswordRecoveryToken(Base):
     __tablename__ = "auth_password_recovery_tokens"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True, autoincrement=True)
-    email: Mapped[str] = mapped_column(String(1000))
-    recovery_token: Mapped[str] = mapped_column(String(1000))
-    expires_at: Mapped[datetime] = mapped_column()
+    email: Mapped[str] = mapped_column(String(1000), index=True)
+    # SHA-256 (hex) del token: el token en sí no se persiste
+    token_digest: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+
+
+class AuthRefreshToken(Base):
+    """Refresh token emitido. Todos los tokens obtenidos por rotación a partir de un
+    mismo login comparten `family_id`; si uno ya rotado se vuelve a presentar después
+    de REFRESH_TOKEN_REUSE_GRACE_SECONDS, se revoca la familia completa.
+    """
+
+    __tablename__ = "auth_refresh_tokens"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # SHA-256 (hex) del claim "jti": el token en sí no se persiste
+    jti_digest: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    family_id: Mapped[str] = mapped_column(String(32), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id", ondelete="CASCADE"), index=True)
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+    rotated_at: Mapped[Optional[datetime]] = mapped_column(default=None)
+    revoked: Mapped[bool] = mapped_column(default=False)
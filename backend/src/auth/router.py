@@ -1,53 +1,84 @@
 from typing import Dict
-from fastapi import Depends, APIRouter, Response
+from fastapi import BackgroundTasks, Depends, APIRouter, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from src.database import get_db
-from src.settings import get_delete_token_settings, get_refresh_token_settings
+from src.database import get_db, run_db
+from src.settings import (
+    JWKS_MAX_AGE,
+    REFRESH_TOKEN_COOKIE_NAME,
+    get_delete_token_settings,
+    get_refresh_token_settings,
+)
 from src.auth import service, schemas, exceptions
-from src.auth.utils import create_access_token, create_refresh_token
-from src.auth.dependencies import get_refresh_user, get_current_user
+from src.auth.keys import access_keys
+from src.auth.utils import create_access_token, issue_token_pair
+from src.auth.dependencies import (
+    check_login_rate_limit,
+    get_current_user,
+    get_refresh_token_payload,
+    get_refresh_user,
+    has_admin_role,
+)
 from src.users import schemas as users_schemas
 from src.users import service as users_service
 
 router = APIRouter(prefix="/auth", tags=["auth"])
+well_known_router = APIRouter(prefix="/.well-known", tags=["auth"])
 
 
-@router.post("/token", response_model=schemas.Token)
+@router.post(
+    "/token",
+    response_model=schemas.Token,
+    dependencies=[Depends(check_login_rate_limit)],
+)
 async def login(
     response: Response,
+    background_tasks: BackgroundTasks,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
 ) -> schemas.Token:
-    user = service.authenticate_user(form_data.username, form_data.password, db)
-    refresh_token_value = await create_refresh_token(db, user.id)
-    access_token = create_access_token(user)
-    response.set_cookie(**get_refresh_token_settings(refresh_token_value))
+    user = await service.authenticate_user(
+        form_data.username, form_data.password, db, background_tasks
+    )
+    tokens = issue_token_pair(user)
+    await run_db(db, service.store_refresh_token, user.id, tokens)
+    response.set_cookie(**get_refresh_token_settings(tokens.refresh_token))
 
-    return schemas.Token(access_token=access_token, user_id=user.id)
+    return schemas.Token(access_token=tokens.access_token, user_id=user.id)
 
 
 @router.put("/token", response_model=schemas.Token)
 async def refresh_tokens(
     response: Response,
     db: Session = Depends(get_db),
+    payload: dict = Depends(get_refresh_token_payload),
     user=Depends(get_refresh_user),
 ):
-    new_access_token = create_access_token(user)
-    new_refresh_token = await create_refresh_token(db, user.id)
-    response.set_cookie(**get_refresh_token_settings(new_refresh_token))
+    tokens = issue_token_pair(user)
+    await run_db(db, service.rotate_refresh_token, payload.get("jti"), user.id, tokens)
+    response.set_cookie(**get_refresh_token_settings(tokens.refresh_token))
 
-    return schemas.Token(access_token=new_access_token, user_id=user.id)
+    return schemas.Token(access_token=tokens.access_token, user_id=user.id)
 
 
 @router.post("/register", response_model=users_schemas.User)
-def register_user(user: users_schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = users_service.create_user(db=db, user=user)
+async def register_user(user: users_schemas.UserCreate, db: Session = Depends(get_db)):
+    db_user = await users_service.create_user(db=db, user=user)
     return db_user
 
 
 @router.delete("/token")
-async def logout_user(response: Response) -> Dict:
+async def logout_user(
+    request: Request, response: Response, db: Session = Depends(get_db)
+) -> Dict:
+    token = request.cookies.get(REFRESH_TOKEN_COOKIE_NAME)
+    if token:
+        try:
+            jti = get_refresh_token_payload(token).get("jti")
+        except exceptions.RefreshTokenNotValid:
+            jti = None
+        if jti is not None:
+            await run_db(db, service.revoke_refresh_token, jti)
     response.delete_cookie(**get_delete_token_settings())
 
     return {
@@ -60,7 +91,7 @@ async def forgot_password(
     forgot_password_data: schemas.ForgotPasswordData,
     db: Session = Depends(get_db),
 ) -> schemas.ForgotPasswordEmailSent:
-    return service.send_password_recovery_email(db, forgot_password_data)
+    return await run_db(db, service.send_password_recovery_email, forgot_password_data)
 
 
 @router.post("/password-recovery")
@@ -69,7 +100,7 @@ async def password_recovery(
     password_update_data: schemas.PasswordUpdateData,
     db: Session = Depends(get_db),
 ) -> schemas.PasswordUpdated:
-    return service.update_user_password(db, token, password_update_data)
+    return await service.update_user_password(db, token, password_update_data)
 
 
 @router.post("/password-reset")
@@ -78,7 +109,20 @@ async def password_reset(
     user=Depends(get_current_user),
     db: Session = Depends(get_db),
 ) -> schemas.PasswordUpdated:
-    return service.reset_user_password(db, user, password_reset_data)
+    return await service.reset_user_password(db, user, password_reset_data)
+
+
+@router.post(
+    "/introspect",
+    response_model=schemas.IntrospectionResponse,
+    dependencies=[Depends(has_admin_role)],
+)
+async def introspect(
+    introspection_request: schemas.IntrospectionRequest,
+    db: Session = Depends(get_db),
+) -> schemas.IntrospectionResponse:
+    """Estado de un lote de access tokens (para gateways), sin emitir tokens nuevos."""
+    return await service.introspect_tokens(db, introspection_request.tokens)
 
 
 @router.get("/validate-user", response_model=schemas.Token)
@@ -87,3 +131,15 @@ async def validate_user(auth_user=Depends(get_current_user)) -> schemas.Token:
         access_token = create_access_token(auth_user)
         return schemas.Token(access_token=access_token, user_id=auth_user.id)
     raise exceptions.NotAuthenticated()
+
+
+@well_known_router.get("/jwks.json")
+async def jwks(request: Request) -> Response:
+    """Claves públicas para verificar los access tokens sin consultar este servicio
+    (ver `src.auth.verifier`). Vacío si los tokens se firman con HMAC.
+    """
+    body, etag = access_keys.jwks
+    headers = {"Cache-Control": f"public, max-age={JWKS_MAX_AGE}", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+from src.auth.constants import Introspection
 
 class Token(BaseModel):
     access_token: str
@@ -37,3 +38,20 @@ class PasswordUpdated(BaseModel):
 class PasswordResetData(BaseModel):
     current_password: Optional[str] = None
     new_password: str
+
+
+class IntrospectionRequest(BaseModel):
+    tokens: List[str] = Field(max_length=Introspection.MAX_TOKENS)
+
+
+class TokenIntrospection(BaseModel):
+    active: bool
+    user_id: Optional[int] = None
+    username: Optional[str] = None
+    role_id: Optional[int] = None
+    exp: Optional[int] = None
+    claims_version: Optional[int] = None
+
+
+class IntrospectionResponse(BaseModel):
+    results: List[TokenIntrospection]
@@ -1,99 +1,302 @@
-import jwt
 import datetime
-from fastapi import Depends
-from typing import Union
-from sqlalchemy import select, delete
+from fastapi import BackgroundTasks, Depends
+from sqlalchemy import select, delete, update
+from jwt.exceptions import InvalidTokenError
 from sqlalchemy.orm import Session
-from src.auth.utils import check_passwords_match, verify_password
+from typing import List, Optional
+from src.auth.utils import (
+    check_password_needs_rehash,
+    check_passwords_match,
+    get_password_hash,
+    reject_password,
+)
 from src.auth.schemas import (
     ForgotPasswordData,
     ForgotPasswordEmailSent,
+    IntrospectionResponse,
+    TokenIntrospection,
     PasswordResetData,
     PasswordUpdated,
     PasswordUpdateData,
 )
-from src.database import get_db
+from src.database import detached_copy, get_db, run_db, run_in_session
+from src.scheduler import PeriodicTask, scheduler
 from src.auth import constants, utils, exceptions
+from src.auth.cache import refresh_denylist, token_cache, token_versions
+from src.auth.claims import claim_codec
+from src.auth.keys import access_keys
 from src.auth.models import AuthPasswordRecoveryToken as RecoveryToken
+from src.auth.models import AuthRefreshToken as RefreshToken
+from src.auth.singleflight import login_flights
 from src.users.service import (
     get_user,
     get_user_by_username,
+    get_users_by_ids,
     update_user,
     check_invalid_password,
 )
 from src.users import models as user_models
+from src.users.usernames import username_filter
 from src.users import exceptions as user_exceptions
 from src.users import schemas as users_schemas
 from src.settings import (
     MAIN_SITE_DOMAIN,
     REFRESH_TOKEN_EXPIRE_DAYS,
-    SECRET_KEY,
-    ALGORITHM,
+    RECOVERY_TOKEN_SWEEP_INTERVAL,
+    RECOVERY_TOKEN_SWEEP_BATCH_SIZE,
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS,
+    REFRESH_TOKEN_STORE,
+    REFRESH_TOKEN_SWEEP_INTERVAL,
+    REFRESH_TOKEN_SWEEP_BATCH_SIZE,
 )
 from src.users.utils import get_user_by_email
 
 
-def authenticate_user(username: str, password: str, db: Session = Depends(get_db)):
+async def authenticate_user(
+    username: str,
+    password: str,
+    db: Session = Depends(get_db),
+    background_tasks: Optional[BackgroundTasks] = None,
+):
+    """Autentica las credenciales. Los intentos idénticos concurrentes (p. ej.
+    reintentos de un cliente) comparten una única consulta y verificación, y reciben
+    el mismo usuario o la misma excepción.
+    """
+
+    async def authenticate():
+        user = await _authenticate_user(username, password, db, background_tasks)
+        return user, detached_copy(user)
+
+    (user, shared_copy), shared = await login_flights.do(
+        login_flights.key(username, password), authenticate
+    )
+    if shared:
+        # el usuario del líder pertenece a otra sesión
+        return await run_db(db, _merge_user, shared_copy)
+    return user
+
+
+def _merge_user(db: Session, user: user_models.User) -> user_models.User:
+    return db.merge(user, load=False)
+
+
+async def _authenticate_user(
+    username: str,
+    password: str,
+    db: Session,
+    background_tasks: Optional[BackgroundTasks],
+) -> user_models.User:
+    # un username inexistente sigue el mismo camino de hashing que una contraseña
+    # incorrecta; el filtro de usernames evita además buscar el usuario en la DB
+    if await username_filter.confirm_absent(username):
+        await reject_password(password)
     try:
-        user = get_user_by_username(db, username)
-    except exceptions.UserNotFound:
-        raise exceptions.IncorrectUserOrPassword()
-    check_passwords_match(password, user.hashed_password)
+        user = await run_db(db, get_user_by_username, username)
+    except user_exceptions.UserNotFound:
+        username_filter.record_false_positive()
+        await reject_password(password)
+    if await check_password_needs_rehash(password, user.hashed_password) and background_tasks:
+        # el hash nuevo se calcula después de enviar la respuesta
+        background_tasks.add_task(rehash_password, user.id, password, user.hashed_password)
     return user
 
 
-def expire_invalid_recovery_tokens(db: Session, email: str):
-    db.execute(
-        delete(RecoveryToken).where(
-            RecoveryToken.email == email,
-            RecoveryToken.expires_at < datetime.datetime.now(datetime.UTC),
+def _replace_password_hash(db: Session, user_id: int, old_hash: str, new_hash: str) -> int:
+    # sólo si el hash no cambió mientras tanto (p. ej. un cambio de contraseña)
+    result = db.execute(
+        update(user_models.User)
+        .where(
+            user_models.User.id == user_id,
+            user_models.User.hashed_password == old_hash,
         )
+        .values(hashed_password=new_hash)
     )
     db.commit()
+    return result.rowcount
+
+
+async def rehash_password(user_id: int, password: str, old_hash: str) -> None:
+    """Actualiza un hash con parámetros anteriores a los configurados. La contraseña
+    no cambia, por lo que los tokens emitidos siguen siendo válidos.
+    """
+    try:
+        new_hash = await get_password_hash(password)
+    except exceptions.HashingPoolSaturated:
+        # se reintenta en el próximo login, sin sumar carga al pool saturado
+        return
+    await run_in_session(_replace_password_hash, user_id, old_hash, new_hash)
 
 
-def get_most_recent_valid_recovery_token(
-    db: Session, email: str
-) -> Union[RecoveryToken, None]:
-    return db.scalar(
-        select(RecoveryToken)
+def _purge_expired(db: Session, model, batch_size: int) -> int:
+    """Elimina las filas vencidas de `model` en lotes de `batch_size`, confirmando
+    cada lote para no retener locks durante todo el barrido.
+    """
+    now = datetime.datetime.now(datetime.UTC)
+    purged = 0
+    while True:
+        ids = db.scalars(
+            select(model.id).where(model.expires_at < now).limit(batch_size)
+        ).all()
+        if ids:
+            db.execute(delete(model).where(model.id.in_(ids)))
+            db.commit()
+            purged += len(ids)
+        if len(ids) < batch_size:
+            return purged
+
+
+def purge_expired_recovery_tokens(db: Session, batch_size: int) -> int:
+    return _purge_expired(db, RecoveryToken, batch_size)
+
+
+def purge_expired_refresh_tokens(db: Session, batch_size: int) -> int:
+    refresh_denylist.purge_expired()
+    return _purge_expired(db, RefreshToken, batch_size)
+
+
+recovery_token_sweeper = scheduler.add(
+    PeriodicTask(
+        "recovery_token_sweeper",
+        RECOVERY_TOKEN_SWEEP_INTERVAL,
+        lambda: run_in_session(purge_expired_recovery_tokens, RECOVERY_TOKEN_SWEEP_BATCH_SIZE),
+    )
+)
+
+
+refresh_token_sweeper = scheduler.add(
+    PeriodicTask(
+        "refresh_token_sweeper",
+        REFRESH_TOKEN_SWEEP_INTERVAL,
+        lambda: run_in_session(purge_expired_refresh_tokens, REFRESH_TOKEN_SWEEP_BATCH_SIZE),
+    )
+)
+
+
+def store_refresh_token(
+    db: Session, user_id: int, tokens: utils.TokenPair, family_id: Optional[str] = None
+) -> None:
+    """Registra el refresh token de `tokens`; sin `family_id` inicia una familia nueva."""
+    if not REFRESH_TOKEN_STORE:
+        return
+    db.add(
+        RefreshToken(
+            jti_digest=utils.token_digest(tokens.refresh_jti),
+            family_id=family_id or tokens.refresh_jti,
+            user_id=user_id,
+            expires_at=tokens.refresh_expires_at,
+        )
+    )
+    db.commit()
+
+
+def revoke_refresh_family(db: Session, family_id: str) -> None:
+    """Revoca todos los refresh tokens de la familia y los agrega al denylist."""
+    rows = db.execute(
+        select(RefreshToken.jti_digest, RefreshToken.expires_at).where(
+            RefreshToken.family_id == family_id, RefreshToken.revoked.is_(False)
+        )
+    ).all()
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id)
+        .values(revoked=True)
+    )
+    db.commit()
+    for digest, expires_at in rows:
+        refresh_denylist.add(digest, expires_at.replace(tzinfo=datetime.UTC).timestamp())
+
+
+def rotate_refresh_token(
+    db: Session, jti: Optional[str], user_id: int, tokens: utils.TokenPair
+) -> None:
+    """Marca como rotado el refresh token `jti` y registra el nuevo en la misma familia.
+
+    Si `jti` fue rotado hace menos de REFRESH_TOKEN_REUSE_GRACE_SECONDS (p. ej. dos
+    requests del mismo cliente que reciben 401 a la vez y refrescan con la misma
+    cookie), el nuevo token se registra igual en la familia. Si fue rotado antes o
+    está revocado, el token fue reutilizado (posible robo): se revoca la familia
+    completa y se rechaza el refresh.
+    """
+    if not REFRESH_TOKEN_STORE:
+        return
+    if jti is None:
+        # token emitido antes de persistir los refresh tokens
+        return store_refresh_token(db, user_id, tokens)
+    digest = utils.token_digest(jti)
+    family_id = db.scalar(
+        select(RefreshToken.family_id).where(
+            RefreshToken.jti_digest == digest, RefreshToken.user_id == user_id
+        )
+    )
+    if family_id is None:
+        raise exceptions.RefreshTokenNotValid()
+    now = datetime.datetime.now(datetime.UTC)
+    rotated = db.execute(
+        update(RefreshToken)
         .where(
-            RecoveryToken.email == email,
-            RecoveryToken.expires_at > datetime.datetime.now(datetime.UTC),
+            RefreshToken.jti_digest == digest,
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.revoked.is_(False),
+        )
+        .values(rotated_at=now)
+    )
+    # sin rollback: la UPDATE no modificó filas y revertir la sesión del request
+    # expiraría el usuario ya cargado por `get_refresh_user`
+    if rotated.rowcount != 1:
+        if not _rotated_within_grace(db, digest, now):
+            revoke_refresh_family(db, family_id)
+            raise exceptions.RefreshTokenNotValid()
+    store_refresh_token(db, user_id, tokens, family_id=family_id)
+
+
+def _rotated_within_grace(db: Session, digest: str, now: datetime.datetime) -> bool:
+    row = db.execute(
+        select(RefreshToken.rotated_at, RefreshToken.revoked).where(
+            RefreshToken.jti_digest == digest
+        )
+    ).first()
+    if row is None or row.revoked or row.rotated_at is None:
+        return False
+    rotated_at = row.rotated_at.replace(tzinfo=row.rotated_at.tzinfo or datetime.UTC)
+    return (now - rotated_at).total_seconds() <= REFRESH_TOKEN_REUSE_GRACE_SECONDS
+
+
+def revoke_refresh_token(db: Session, jti: str) -> None:
+    """Revoca la familia del refresh token `jti` (logout)."""
+    family_id = db.scalar(
+        select(RefreshToken.family_id).where(
+            RefreshToken.jti_digest == utils.token_digest(jti)
         )
-        .order_by(RecoveryToken.expires_at.desc())
     )
+    if family_id is not None:
+        revoke_refresh_family(db, family_id)
 
 
-def create_recovery_token(db: Session, user: users_schemas.User) -> RecoveryToken:
-    # Expiring invalid tokens first
-    expire_invalid_recovery_tokens(db, user.username)
+def delete_recovery_tokens(db: Session, email: str):
+    db.execute(delete(RecoveryToken).where(RecoveryToken.email == email))
+    db.commit()
 
-    # Checking and retrieving existing valid recovery token
-    existing_recovery_token = get_most_recent_valid_recovery_token(db, user.username)
-    if existing_recovery_token:
-        return existing_recovery_token
 
-    # Creating a new recovery token if none exists
+def create_recovery_token(db: Session, user: users_schemas.User) -> str:
+    # Expired tokens are purged by `recovery_token_sweeper`, not on this path.
+    # Only the digest is stored, so a previously issued token cannot be re-sent:
+    # every request issues a new one (all of them are deleted once one is used).
     expiration_date = datetime.datetime.now(datetime.UTC) + datetime.timedelta(
         minutes=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60
     )
 
-    recovery_token = jwt.encode(
-        {"user_id": user.id, "email": user.email, "exp": expiration_date},
-        SECRET_KEY,
-        algorithm=ALGORITHM,
-    )
+    recovery_token = utils.encode_recovery_token(user.id, user.email, expiration_date)
 
     db_recovery_token = RecoveryToken(
-        email=user.email, recovery_token=recovery_token, expires_at=expiration_date
+        email=user.email,
+        token_digest=utils.token_digest(recovery_token),
+        expires_at=expiration_date,
     )
 
     db.add(db_recovery_token)
     db.commit()
-    db.refresh(db_recovery_token)
 
-    return db_recovery_token
+    return recovery_token
 
 
 def send_password_recovery_email(
@@ -107,9 +310,8 @@ def send_password_recovery_email(
         )
         return ForgotPasswordEmailSent(msg=message, url=None)
 
-    recovery_token_obj = create_recovery_token(db, user)
-    recovery_url = f"{MAIN_SITE_DOMAIN}/password-recovery?token={recovery_token_obj.recovery_token}"
-    print(recovery_token_obj.recovery_token)
+    recovery_token = create_recovery_token(db, user)
+    recovery_url = f"{MAIN_SITE_DOMAIN}/password-recovery?token={recovery_token}"
 
     email_message = constants.Message.PASSWORD_RECOVERY_EMAIL_BODY.substitute(
         {"recovery_url": recovery_url}
@@ -119,28 +321,83 @@ def send_password_recovery_email(
     return ForgotPasswordEmailSent(msg=message, url=recovery_url)
 
 
-def update_user_password(
+async def update_user_password(
     db: Session, token: str, password_update_data: PasswordUpdateData
 ) -> users_schemas.User:
-    user = utils.get_user_password_update_token(token, db)
-    new_user = update_user(
-        db, user, users_schemas.UserUpdate(password=password_update_data.new_password)
+    user = await run_db(
+        db, lambda session: utils.get_user_password_update_token(token, session)
     )
-    db.execute(delete(RecoveryToken).where(RecoveryToken.email == user.email))
-    db.commit()
+    new_user = await update_user(
+        db, user.id, users_schemas.UserUpdate(password=password_update_data.new_password)
+    )
+    await run_db(db, delete_recovery_tokens, user.email)
     return PasswordUpdated(msg=constants.Message.PASSWORD_UPDATED_MSG)
 
 
-def reset_user_password(
+async def reset_user_password(
     db: Session, user: user_models.User, password_reset_data: PasswordResetData
 ):
     # verificamos que la contraseña actual que recibimos matchea con la real.
-    check_passwords_match(
+    await check_passwords_match(
         password=password_reset_data.current_password,
         hashed_password=user.hashed_password,
     )
 
-    update_user(
-        db, user, users_schemas.UserUpdate(password=password_reset_data.new_password)
+    await update_user(
+        db, user.id, users_schemas.UserUpdate(password=password_reset_data.new_password)
     )
     return PasswordUpdated(msg=constants.Message.PASSWORD_UPDATED_MSG)
+
+
+async def introspect_tokens(db: Session, tokens: List[str]) -> IntrospectionResponse:
+    """Verifica un lote de access tokens sin emitir tokens nuevos.
+
+    Los tokens presentes en `token_cache` se resuelven sin decodificarlos; los
+    usuarios del resto se obtienen con una única consulta.
+    """
+    users, verified = {}, []
+    for token in tokens:
+        cached = token_cache.get(token)
+        if cached is not None:
+            users[cached.user_id] = cached.user
+            payload = cached.claims
+        else:
+            try:
+                payload = access_keys.decode(token)
+            except InvalidTokenError:
+                verified.append(None)
+                continue
+        try:
+            verified.append((token, payload, claim_codec.decode(payload)))
+        except exceptions.InvalidCredentials:
+            verified.append(None)
+
+    user_ids = {item[2].user_id for item in verified if item is not None}
+    loaded = await run_db(db, get_users_by_ids, list(user_ids - users.keys()))
+    for user in loaded.values():
+        token_versions.set(user.id, user.token_version)
+    users.update(loaded)
+
+    results = []
+    for item in verified:
+        user = users.get(item[2].user_id) if item is not None else None
+        # como en `get_current_user`: los tokens emitidos antes de un cambio de
+        # contraseña o de rol no están activos
+        if user is None or not token_versions.is_current(
+            user.id, item[2].token_version, user.token_version
+        ):
+            results.append(TokenIntrospection(active=False))
+            continue
+        token, payload, claims = item
+        token_cache.put(token, payload, user)
+        results.append(
+            TokenIntrospection(
+                active=True,
+                user_id=user.id,
+                username=user.username,
+                role_id=claims.role_id,
+                exp=payload["exp"],
+                claims_version=claims.version,
+            )
+        )
+    return IntrospectionResponse(results=results)
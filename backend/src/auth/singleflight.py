@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+import hmac
+import secrets
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+from src.settings import LOGIN_SINGLE_FLIGHT
+from src.monitoring.service import register_collector
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Agrupa las llamadas concurrentes con la misma clave en una sola ejecución.
+
+    La primera llamada (líder) ejecuta la función y las que llegan mientras está en
+    curso esperan su resultado o su excepción. Nada se conserva al terminar: una
+    llamada posterior con la misma clave vuelve a ejecutarla. Las claves se derivan
+    con HMAC-SHA256 y un secreto aleatorio por proceso, de modo que las credenciales
+    no quedan en memoria como claves del diccionario.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._secret = secrets.token_bytes(32)
+        self._calls: Dict[bytes, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.retried = 0
+
+    def key(self, *parts: str) -> bytes:
+        message = b"\0".join(part.encode() for part in parts)
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    async def do(self, key: bytes, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Devuelve el resultado de `fn` y si fue compartido con otra llamada en curso."""
+        if not self.enabled:
+            return await fn(), False
+        while (future := self._calls.get(key)) is not None:
+            self.coalesced += 1
+            try:
+                # shield: cancelar a un seguidor no cancela la ejecución compartida
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # el líder se canceló (p. ej. el cliente se desconectó): se reintenta
+                self.coalesced -= 1
+                self.retried += 1
+
+        future = asyncio.get_running_loop().create_future()
+        # evita el aviso "exception was never retrieved" cuando no hay seguidores
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._calls[key] = future
+        self.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+        }
+
+
+login_flights = SingleFlight(enabled=LOGIN_SINGLE_FLIGHT)
+register_collector("login_single_flight", login_flights.stats)
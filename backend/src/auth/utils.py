@@ -1,76 +1,142 @@
-import jwt
 import datetime
+import hashlib
+import uuid
 from jwt.exceptions import InvalidTokenError
 from fastapi import Depends
-from pwdlib import PasswordHash
 from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import NamedTuple, Optional
 from src.settings import (
-    REFRESH_SECRET_KEY,
-    SECRET_KEY,
-    ALGORITHM,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     REFRESH_TOKEN_EXPIRE_DAYS,
 )
 from src.database import get_db
-from src.auth import schemas, exceptions
+from src.auth import constants, schemas, exceptions
+from src.auth.claims import claim_codec
+from src.auth.keys import KeyRing, access_keys, refresh_keys
+from src.auth.hashing import (
+    hashing_executor,
+    hash_password,
+    verify_dummy_hash,
+    verify_hash,
+    verify_hash_and_check,
+)
 from src.auth.models import AuthPasswordRecoveryToken as RecoveryToken
 from src.users import models as users_models
-from src.users import schemas as users_schemas
 from src.users import utils as users_utils
 
-password_hash = PasswordHash.recommended()
+async def check_passwords_match(password: str, hashed_password: str) -> None:
+    if not await verify_password(password, hashed_password):
+        raise exceptions.IncorrectUserOrPassword()
 
 
-def check_passwords_match(password: str, hashed_password: str) -> None:
-    if not verify_password(password, hashed_password):
+async def check_password_needs_rehash(password: str, hashed_password: str) -> bool:
+    """Verifica la contraseña (IncorrectUserOrPassword si no coincide) e indica si el
+    hash fue generado con parámetros distintos de los actuales.
+    """
+    matches, needs_rehash = await hashing_executor.run(
+        verify_hash_and_check, password, hashed_password
+    )
+    if not matches:
         raise exceptions.IncorrectUserOrPassword()
+    return needs_rehash
+
+
+async def verify_password(plain_password, hashed_password):
+    return await hashing_executor.run(verify_hash, plain_password, hashed_password)
 
 
-def verify_password(plain_password, hashed_password):
-    return password_hash.verify(plain_password, hashed_password)
+async def reject_password(password: str) -> None:
+    """Consume el mismo tiempo de hashing que una verificación real y rechaza el intento."""
+    await hashing_executor.run(verify_dummy_hash, password)
+    raise exceptions.IncorrectUserOrPassword()
 
 
-def get_password_hash(password):
-    return password_hash.hash(password)
+async def get_password_hash(password):
+    return await hashing_executor.run(hash_password, password)
 
 
 def encode_token(
-    data: dict, expires_delta_minutes: Optional[int] = 15, key: str = SECRET_KEY
+    data: dict, expires_delta_minutes: Optional[int] = 15, keys: KeyRing = access_keys
 ):
     to_encode = data.copy()
     expire = datetime.datetime.now(datetime.UTC) + datetime.timedelta(
         minutes=expires_delta_minutes
     )
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, key, algorithm=ALGORITHM)
+    encoded_jwt = keys.encode(to_encode)
     return encoded_jwt
 
 
+def _user_claims(user: users_models.User) -> dict:
+    return claim_codec.encode(user.id, user.role_id, user.token_version)
+
+
 def create_access_token(
-    user: users_models.User, expiration_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES
+    user: users_models.User,
+    expiration_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES,
+    claims: Optional[dict] = None,
 ):
-    serialized_user = users_schemas.User.model_validate(user).model_dump_json()
     access_token = encode_token(
-        data={"sub": serialized_user},
+        data=claims if claims is not None else _user_claims(user),
         expires_delta_minutes=expiration_minutes,
     )
     return access_token
 
 
-async def create_refresh_token(db: Session, user_id: int) -> str:
-    user = db.scalar(select(users_models.User).where(users_models.User.id == user_id))
+def create_refresh_token(user: users_models.User, claims: Optional[dict] = None) -> str:
     expiration_minutes = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60
-    serialized_user = users_schemas.User.model_validate(user).model_dump_json()
     refresh_token = encode_token(
-        data={"sub": serialized_user},
+        data=claims if claims is not None else _user_claims(user),
         expires_delta_minutes=expiration_minutes,
-        key=REFRESH_SECRET_KEY,
+        keys=refresh_keys,
     )
     return refresh_token
 
 
+class TokenPair(NamedTuple):
+    access_token: str
+    refresh_token: str
+    refresh_jti: str
+    refresh_expires_at: datetime.datetime
+
+
+def issue_token_pair(user: users_models.User) -> TokenPair:
+    """Emite el access y el refresh token de un usuario ya cargado, armando los
+    claims una sola vez y sin consultar la DB. El refresh token lleva un "jti"
+    único con el que `service.store_refresh_token` lo registra.
+    """
+    claims = _user_claims(user)
+    jti = uuid.uuid4().hex
+    expires_at = datetime.datetime.now(datetime.UTC) + datetime.timedelta(
+        days=REFRESH_TOKEN_EXPIRE_DAYS
+    )
+    return TokenPair(
+        create_access_token(user, claims=claims),
+        create_refresh_token(user, claims={**claims, "jti": jti}),
+        jti,
+        expires_at,
+    )
+
+
+def encode_recovery_token(user_id: int, email: str, expires_at: datetime.datetime) -> str:
+    return access_keys.encode(
+        {
+            "user_id": user_id,
+            "email": email,
+            "aud": constants.PasswordRecovery.AUDIENCE,
+            "exp": expires_at,
+        }
+    )
+
+
+def token_digest(token: str) -> str:
+    """Digest de longitud fija con el que se guardan y se buscan los tokens de
+    recuperación y los jti de los refresh tokens.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 def _is_valid_refresh_token(expires_at: datetime) -> bool:
     return datetime.datetime.now(datetime.UTC) <= expires_at.astimezone(datetime.UTC)
 
@@ -80,12 +146,11 @@ def get_user_password_update_token(
     db: Session = Depends(get_db),
 ) -> None:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        import pdb
-
-        pdb.set_trace()
+        payload = access_keys.decode(token, audience=constants.PasswordRecovery.AUDIENCE)
         recovery_token_obj = db.scalar(
-            select(RecoveryToken).where(RecoveryToken.recovery_token == token)
+            select(RecoveryToken).where(
+                RecoveryToken.token_digest == token_digest(token)
+            )
         )
         if not recovery_token_obj:
             raise exceptions.InvalidPasswordUpdateToken()
@@ -0,0 +1,126 @@
+"""Verificación local de access tokens para otros servicios.
+
+Este módulo no depende del resto de `src` (sólo de PyJWT y cryptography), por lo
+que puede copiarse o importarse desde cualquier servicio que reciba los tokens:
+
+    verifier = JWKSVerifier("https://auth.example.com/.well-known/jwks.json")
+    claims = verifier.verify(token)     # lanza InvalidTokenError si no es válido
+    user_id = int(claims["sub"])
+
+El JWKS se cachea según el Cache-Control de la respuesta (o `ttl`) y se vuelve a
+pedir antes de tiempo sólo si aparece un `kid` desconocido, a lo sumo una vez cada
+`min_refresh_interval` segundos. Si el servicio de auth no responde se siguen
+usando las claves ya cacheadas.
+"""
+import json
+import re
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+import jwt
+from jwt.exceptions import InvalidTokenError, PyJWKClientConnectionError
+
+# fetch(url) -> (JWKS como dict, headers de la respuesta)
+Fetcher = Callable[[str], Tuple[Dict[str, Any], Mapping[str, str]]]
+
+DEFAULT_ALGORITHMS = ("RS256", "RS384", "RS512", "PS256", "ES256", "EdDSA")
+# claims obligatorios de un access token (formato compacto v1)
+ACCESS_CLAIMS = ("exp", "v", "sub", "tv")
+ACCESS_CLAIMS_VERSION = 1
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def urllib_fetch(url: str, timeout: float = 5.0) -> Tuple[Dict[str, Any], Mapping[str, str]]:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response), dict(response.headers)
+
+
+class JWKSVerifier:
+    def __init__(
+        self,
+        jwks_url: str,
+        algorithms: Iterable[str] = DEFAULT_ALGORITHMS,
+        ttl: float = 300,
+        min_refresh_interval: float = 30,
+        leeway: float = 0,
+        fetch: Optional[Fetcher] = None,
+    ) -> None:
+        self.jwks_url = jwks_url
+        self.algorithms = frozenset(algorithms)
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.leeway = leeway
+        self.fetch = fetch or urllib_fetch
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._expires_at = 0.0
+        self._fetched_at = float("-inf")
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.fetch_errors = 0
+
+    def _max_age(self, headers: Mapping[str, str]) -> float:
+        cache_control = {key.lower(): value for key, value in headers.items()}.get(
+            "cache-control", ""
+        )
+        match = _MAX_AGE.search(cache_control)
+        return float(match.group(1)) if match else self.ttl
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        self._fetched_at = now
+        try:
+            document, headers = self.fetch(self.jwks_url)
+        except Exception as error:
+            self.fetch_errors += 1
+            if not self._keys:
+                raise PyJWKClientConnectionError(f"No se pudo obtener el JWKS: {error!r}")
+            # se mantienen las claves anteriores y se reintenta más adelante
+            self._expires_at = now + self.min_refresh_interval
+            return
+        self.fetches += 1
+        self._keys = {
+            jwk["kid"]: jwt.PyJWK(jwk)
+            for jwk in document.get("keys", [])
+            if jwk.get("alg") in self.algorithms
+        }
+        self._expires_at = now + self._max_age(headers)
+
+    def get_key(self, kid: Optional[str]) -> jwt.PyJWK:
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._expires_at:
+                self._refresh()
+            key = self._keys.get(kid)
+            if key is None and now - self._fetched_at >= self.min_refresh_interval:
+                # posible rotación: el kid todavía no estaba en el JWKS cacheado
+                self._refresh()
+                key = self._keys.get(kid)
+        if key is None:
+            raise InvalidTokenError("kid desconocido")
+        return key
+
+    def verify(self, token: str, **kwargs: Any) -> Dict[str, Any]:
+        """Verifica firma y expiración del token y que tenga el formato de un access
+        token ("v", "sub" y "tv"); devuelve sus claims.
+        """
+        header = jwt.get_unverified_header(token)
+        key = self.get_key(header.get("kid"))
+        if header.get("alg") != key.algorithm_name:
+            raise InvalidTokenError("Algoritmo no esperado")
+        options = {**kwargs.pop("options", {}), "require": list(ACCESS_CLAIMS)}
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=[key.algorithm_name],
+            leeway=self.leeway,
+            options=options,
+            **kwargs,
+        )
+        if (
+            claims["v"] != ACCESS_CLAIMS_VERSION
+            or not str(claims["sub"]).isdigit()
+            or not isinstance(claims["tv"], int)
+        ):
+            raise InvalidTokenError("El token no es un access token")
+        return claims
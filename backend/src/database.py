@@ -1,9 +1,92 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from src.settings import DB_URL
+from typing import Any, Callable, Dict, TypeVar, Union
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base, make_transient_to_detached
+from starlette.concurrency import run_in_threadpool
+from src.settings import (
+    DB_URL,
+    DB_ASYNC,
+    ASYNC_DB_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+)
+from src.monitoring.pool import (
+    AsyncAdaptedQueuePool,
+    PoolMonitor,
+    QueuePool,
+    timed_pool_class,
+)
+from src.monitoring.service import register_collector
+from src.monitoring.tracing import instrument_engine
 
-engine = create_engine(DB_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+T = TypeVar("T")
+
+# drivers async utilizados cuando ASYNC_DB_URL no está definida
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def get_async_url(url: str) -> URL:
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def _is_memory_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def get_engine_options(url: Union[str, URL], pool_class, monitor: PoolMonitor) -> Dict[str, Any]:
+    """Opciones de pool para `create_engine`/`create_async_engine` según settings.
+
+    SQLite en memoria usa su propio pool (una única conexión), por lo que solo
+    se le aplican pre-ping y recycle.
+    """
+    url = make_url(url)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if not _is_memory_sqlite(url):
+        options.update(
+            poolclass=timed_pool_class(pool_class, monitor),
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+pool_monitor = PoolMonitor()
+engine = create_engine(DB_URL, **get_engine_options(DB_URL, QueuePool, pool_monitor))
+pool_monitor.instrument(engine)
+instrument_engine(engine)
+# expire_on_commit=False: los objetos devueltos luego de un commit (p. ej. por
+# UPDATE ... RETURNING) se serializan sin volver a consultar la DB.
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
+
+async_engine = None
+async_pool_monitor = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_url = ASYNC_DB_URL or get_async_url(DB_URL)
+    async_pool_monitor = PoolMonitor()
+    async_engine = create_async_engine(
+        async_url,
+        **get_engine_options(async_url, AsyncAdaptedQueuePool, async_pool_monitor),
+    )
+    async_pool_monitor.instrument(async_engine.sync_engine)
+    instrument_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
 
 
 # original author: https://stackoverflow.com/a/54034230
@@ -15,6 +98,42 @@ def keyvalgen(obj):
             yield k, v
 
 
+def pool_stats() -> Dict[str, Any]:
+    stats = {"sync": pool_monitor.stats()}
+    if async_pool_monitor is not None:
+        stats["async"] = async_pool_monitor.stats()
+    return stats
+
+
+register_collector("db_pool", pool_stats)
+
+
+async def warm_up_pool(connections: int) -> None:
+    """Abre `connections` conexiones del engine activo y las devuelve al pool,
+    para que los primeros requests no paguen el costo de conectarse.
+    """
+    if async_engine is not None:
+        opened = [await async_engine.connect() for _ in range(connections)]
+        for connection in opened:
+            await connection.close()
+    else:
+        opened = [await run_in_threadpool(engine.connect) for _ in range(connections)]
+        for connection in opened:
+            connection.close()
+
+
+async def run_in_session(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Ejecuta `fn(session, *args, **kwargs)` en una sesión nueva (para tareas fuera de un request)."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await run_db(db, fn, *args, **kwargs)
+    db = SessionLocal()
+    try:
+        return await run_db(db, fn, *args, **kwargs)
+    finally:
+        db.close()
+
+
 class Base:
 
     def __repr__(self):
@@ -25,10 +144,59 @@ class Base:
 Base = declarative_base(cls=Base)
 
 
-# Dependency
-def get_db():
+def detached_copy(obj):
+    """Devuelve una copia desacoplada de una instancia ORM (columnas y relaciones
+    many-to-one ya cargadas) que puede asociarse a otra sesión con
+    `session.merge(copy, load=False)` sin consultar la DB.
+    """
+    state = inspect(obj)
+    mapper = state.mapper
+    copy = mapper.class_(
+        **{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs}
+    )
+    for relationship in mapper.relationships:
+        if relationship.uselist or relationship.key in state.unloaded:
+            continue
+        related = getattr(obj, relationship.key)
+        setattr(
+            copy,
+            relationship.key,
+            detached_copy(related) if related is not None else None,
+        )
+    make_transient_to_detached(copy)
+    return copy
+
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Dependency
+get_db = get_async_db if DB_ASYNC else get_sync_db
+
+
+def sync_session(db: Union[Session, AsyncSession]) -> Session:
+    """Devuelve la Session sincrónica subyacente (para operaciones sin I/O, como merge(load=False))."""
+    return db.sync_session if isinstance(db, AsyncSession) else db
+
+
+async def run_db(
+    db: Union[Session, AsyncSession], fn: Callable[..., T], *args: Any, **kwargs: Any
+) -> T:
+    """Ejecuta `fn(session, *args, **kwargs)` sin bloquear el event loop.
+
+    Con una AsyncSession, `fn` corre mediante `run_sync` sobre el driver async;
+    con una Session sincrónica, corre en el threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
@@ -1,40 +1,264 @@
-from src.database import engine, Base, SessionLocal
+"""Carga de datos iniciales y generación de datos sintéticos.
+
+    python -m src.load_data
+    python -m src.load_data --users 1000000 --recovery-tokens 100000
+    python -m src.load_data --users 100000 --unique-hashes --hash-workers 8 --db-url postgresql://...
+
+Sin argumentos crea los roles y un usuario por rol (contraseña "123456789"). Con
+`--users N` genera además los usuarios `<prefix>0` ... `<prefix>{N - 1}` repartidos
+entre los roles, con inserts por lotes. Por defecto todos comparten un único hash de
+`--password`; con `--unique-hashes` cada usuario tiene su propio hash (misma
+contraseña, distinto salt), calculado en `--hash-workers` procesos con los
+parámetros de Argon2 configurados, lo que puede llevar horas para millones de
+usuarios (ARGON2_TIME_COST y ARGON2_MEMORY_COST pueden bajarse sólo para la carga;
+los hashes se actualizan en el próximo login). `--recovery-tokens M` crea tokens de recuperación válidos para los
+primeros M usuarios y puede guardarlos en `--tokens-file`.
+
+Volver a ejecutar el comando sólo crea lo que falta.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from src.database import engine, SessionLocal
+from src.auth.hashing import hash_password
+from src.auth.models import AuthPasswordRecoveryToken as RecoveryToken
+from src.auth.utils import encode_recovery_token, token_digest
+from src.settings import REFRESH_TOKEN_EXPIRE_DAYS
+from src.upgrade_db import upgrade
 from src.users.models import Role, User
+from src.users.roles import role_registry
 from src.users.schemas import UserCreate
 from src.users.service import create_user, assign_role
 
+ROLES = [
+    "user",
+    "admin",
+    "alumno",
+    "docente",
+    "secretaria_academica",
+]
+BASE_PASSWORD = "123456789"
+
 
-def main():
-    Base.metadata.create_all(bind=engine)
-    db = SessionLocal()
-
-    roles = [
-        "user",
-        "admin",
-        "alumno",
-        "docente",
-        "secretaria_academica",
-    ]
-    for rol in roles:
-        rol_usuario = Role(name=rol)
-        db.add(rol_usuario)
+def create_roles(db: Session, names: Sequence[str] = ROLES) -> Dict[str, int]:
+    """Crea los roles que falten y devuelve el id de cada uno."""
+    existing = dict(db.execute(select(Role.name, Role.id).where(Role.name.in_(names))).all())
+    missing = [{"name": name} for name in names if name not in existing]
+    if missing:
+        db.execute(insert(Role), missing)
         db.commit()
-        db.refresh(rol_usuario)
+        existing = dict(db.execute(select(Role.name, Role.id).where(Role.name.in_(names))).all())
+    return existing
+
+
+def _existing(db: Session, column, values: List[str]) -> set:
+    return set(db.scalars(select(column).where(column.in_(values))))
+
 
-        usuario = create_user(
+def generate_users(
+    db: Session,
+    count: int,
+    hash_passwords: Callable[[int], List[str]],
+    prefix: str = "user",
+    role_ids: Sequence[Optional[int]] = (None,),
+    batch_size: int = 10000,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """Crea los usuarios `<prefix>0` ... `<prefix>{count - 1}` que todavía no existan,
+    asignando los roles de `role_ids` en forma rotativa. `hash_passwords(n)` devuelve
+    los hashes de un lote; sólo se calculan para los usuarios que faltan. Cada lote
+    se inserta con una única sentencia y una transacción. Devuelve la cantidad creada.
+    """
+    created = 0
+    for start in range(0, count, batch_size):
+        indexes = range(start, min(start + batch_size, count))
+        usernames = [f"{prefix}{i}" for i in indexes]
+        existing = _existing(db, User.username, usernames)
+        missing = [(i, username) for i, username in zip(indexes, usernames) if username not in existing]
+        if missing:
+            hashes = hash_passwords(len(missing))
+            db.execute(
+                insert(User),
+                [
+                    {
+                        "username": username,
+                        "email": f"{username}@example.com",
+                        "hashed_password": hashed_password,
+                        "role_id": role_ids[i % len(role_ids)],
+                    }
+                    for (i, username), hashed_password in zip(missing, hashes)
+                ],
+            )
+            db.commit()
+            created += len(missing)
+        if progress is not None:
+            progress(indexes.stop, created)
+    return created
+
+
+def create_users(
+    db: Session,
+    count: int,
+    hashed_password: str,
+    prefix: str = "user",
+    role_id: Optional[int] = None,
+    batch_size: int = 10000,
+) -> int:
+    """Crea los usuarios que falten, todos con el mismo hash y rol."""
+    return generate_users(
+        db, count, lambda n: [hashed_password] * n, prefix, [role_id], batch_size
+    )
+
+
+def generate_recovery_tokens(
+    db: Session,
+    count: int,
+    prefix: str = "user",
+    batch_size: int = 10000,
+    valid_for: datetime.timedelta = datetime.timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+) -> List[str]:
+    """Crea un token de recuperación (como `auth.service.create_recovery_token`) para
+    cada uno de los primeros `count` usuarios generados que todavía no tenga uno.
+    Devuelve los tokens creados, ya que sólo se persiste su digest.
+    """
+    expires_at = datetime.datetime.now(datetime.UTC) + valid_for
+    tokens = []
+    for start in range(0, count, batch_size):
+        emails = [f"{prefix}{i}@example.com" for i in range(start, min(start + batch_size, count))]
+        with_token = _existing(db, RecoveryToken.email, emails)
+        users = db.execute(
+            select(User.id, User.email).where(
+                User.email.in_([email for email in emails if email not in with_token])
+            )
+        ).all()
+        rows = []
+        for user_id, email in users:
+            token = encode_recovery_token(user_id, email, expires_at)
+            tokens.append(token)
+            rows.append(
+                {"email": email, "token_digest": token_digest(token), "expires_at": expires_at}
+            )
+        if rows:
+            db.execute(insert(RecoveryToken), rows)
+            db.commit()
+    return tokens
+
+
+async def create_base_users(db: Session, role_ids: Dict[str, int]) -> None:
+    """Un usuario por rol, con el nombre del rol como username."""
+    # `create_user` toma el id del rol por defecto del registro en memoria, que no
+    # ve los roles creados con `create_roles` (inserts por lotes)
+    role_registry.load(db)
+    existing = _existing(db, User.username, list(role_ids))
+    for rol, role_id in role_ids.items():
+        if rol in existing:
+            continue
+        usuario = await create_user(
             db,
             UserCreate(
-                username=rol, email=f"{rol}@gmail.com", password="123456789"
+                username=rol, email=f"{rol}@gmail.com", password=BASE_PASSWORD
             ),
         )
+        assign_role(db=db, user_id=usuario.id, role_id=role_id)
 
-        db.add(usuario)
-        db.commit()
 
-        assign_role(db=db, user_id=usuario.id, role_id=rol_usuario.id)
+async def main():
+    with engine.begin() as conn:
+        upgrade(conn)
+    with SessionLocal() as db:
+        await create_base_users(db, create_roles(db))
+
+
+def _shared_hash(password: str) -> Callable[[int], List[str]]:
+    hashed_password = hash_password(password)
+    return lambda n: [hashed_password] * n
+
+
+def _unique_hashes(password: str, pool: Executor, workers: int) -> Callable[[int], List[str]]:
+    def hash_batch(n: int) -> List[str]:
+        return list(pool.map(hash_password, [password] * n, chunksize=max(1, n // (workers * 4))))
+
+    return hash_batch
+
+
+def _progress(total: int) -> Callable[[int, int], None]:
+    start = time.perf_counter()
+
+    def report(done: int, created: int) -> None:
+        elapsed = time.perf_counter() - start
+        print(
+            f"\r{done:,}/{total:,} usuarios revisados, {created:,} creados "
+            f"({done / elapsed:,.0f}/s)",
+            end="" if done < total else "\n",
+            flush=True,
+        )
+
+    return report
+
+
+def generate(args: argparse.Namespace) -> None:
+    bind = create_engine(args.db_url) if args.db_url else engine
+    with bind.begin() as conn:
+        upgrade(conn)
+    with Session(bind=bind) as db:
+        role_ids = create_roles(db)
+        asyncio.run(create_base_users(db, role_ids))
+        roles = [role_ids[name] for name in args.roles]
+
+        start = time.perf_counter()
+        if args.unique_hashes:
+            with ProcessPoolExecutor(max_workers=args.hash_workers) as pool:
+                hasher = _unique_hashes(args.password, pool, args.hash_workers)
+                created = generate_users(
+                    db, args.users, hasher, args.prefix, roles, args.batch_size, _progress(args.users)
+                )
+        else:
+            created = generate_users(
+                db,
+                args.users,
+                _shared_hash(args.password),
+                args.prefix,
+                roles,
+                args.batch_size,
+                _progress(args.users),
+            )
+        print(f"{created:,} usuarios creados en {time.perf_counter() - start:.1f}s")
 
-    db.close()
+        if args.recovery_tokens:
+            start = time.perf_counter()
+            tokens = generate_recovery_tokens(
+                db, min(args.recovery_tokens, args.users), args.prefix, args.batch_size
+            )
+            print(f"{len(tokens):,} tokens de recuperación creados en {time.perf_counter() - start:.1f}s")
+            if args.tokens_file:
+                with open(args.tokens_file, "a") as file:
+                    file.writelines(f"{token}\n" for token in tokens)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=0, help="usuarios sintéticos a generar")
+    parser.add_argument("--prefix", default="user", help="prefijo de los usernames generados")
+    parser.add_argument("--password", default=BASE_PASSWORD)
+    parser.add_argument(
+        "--roles", nargs="+", choices=ROLES, default=ROLES, help="roles asignados en forma rotativa"
+    )
+    parser.add_argument("--recovery-tokens", type=int, default=0)
+    parser.add_argument("--tokens-file", help="archivo donde agregar los tokens de recuperación creados")
+    parser.add_argument("--unique-hashes", action="store_true", help="un hash por usuario")
+    parser.add_argument("--hash-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--db-url", help="URL de la base (por defecto DB_URL)")
+    args = parser.parse_args()
+    if args.users or args.recovery_tokens:
+        generate(args)
+    else:
+        asyncio.run(main())
@@ -1,16 +1,37 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.auth.router import router as auth_router
+from src.auth.router import router as auth_router, well_known_router
 from src.users.router import router as users_router
+from src.monitoring.router import router as monitoring_router
 from contextlib import asynccontextmanager
-from src.database import engine, Base
-from src.settings import ROOT_PATH
+from src.database import async_engine, run_in_session, warm_up_pool
+from src.settings import ROOT_PATH, DB_POOL_WARMUP
+from src.users.constants import Pagination
+from src.auth.hashing import bulk_hasher, hashing_executor, verify_dummy_hash
+from src.users.roles import role_registry
+from src.users.usernames import username_filter
+from src.upgrade_db import upgrade_database
+from src.scheduler import scheduler
+from src.monitoring.tracing import TracingMiddleware, span_exporter
 
 
 @asynccontextmanager
 async def db_creation_lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine)
+    await upgrade_database()
+    await warm_up_pool(DB_POOL_WARMUP)
+    await run_in_session(role_registry.load)
+    await run_in_session(username_filter.rebuild)
+    # genera el hash descartable antes del primer login de un usuario inexistente
+    await hashing_executor.run(verify_dummy_hash, "")
+    scheduler.start()
     yield
+    await scheduler.stop()
+    hashing_executor.shutdown()
+    bulk_hasher.shutdown()
+    if span_exporter is not None:
+        span_exporter.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 origins = [
     "http://localhost:5173",  # para recibir requests desde app React (puerto: 5173)
@@ -24,7 +45,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[Pagination.NEXT_CURSOR_HEADER, Pagination.TOTAL_COUNT_HEADER],
 )
 
+# se agrega al final para que envuelva también a CORS y mida el request completo
+app.add_middleware(TracingMiddleware)
+
 app.include_router(auth_router)
+app.include_router(well_known_router)
 app.include_router(users_router)
+app.include_router(monitoring_router)
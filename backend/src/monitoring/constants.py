@@ -0,0 +1,4 @@
+class ErrorCode:
+    COLLECTOR_NOT_FOUND = "No existen métricas con ese nombre"
+    PROMETHEUS_DISABLED = "El endpoint de métricas para Prometheus no está habilitado"
+    INVALID_SCRAPE_TOKEN = "Token de acceso a las métricas inválido"
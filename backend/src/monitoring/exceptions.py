@@ -0,0 +1,14 @@
+from src.monitoring.constants import ErrorCode
+from src.exceptions import NotAuthenticated, NotFound
+
+
+class CollectorNotFound(NotFound):
+    DETAIL = ErrorCode.COLLECTOR_NOT_FOUND
+
+
+class PrometheusDisabled(NotFound):
+    DETAIL = ErrorCode.PROMETHEUS_DISABLED
+
+
+class InvalidScrapeToken(NotAuthenticated):
+    DETAIL = ErrorCode.INVALID_SCRAPE_TOKEN
@@ -0,0 +1,79 @@
+import threading
+import time
+from typing import Any, Dict
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from src.monitoring.service import LatencyRecorder
+
+
+class PoolMonitor:
+    """Métricas de un pool de conexiones: checkouts, timeouts y espera por checkout."""
+
+    def __init__(self) -> None:
+        self.checkout_wait = LatencyRecorder()
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self._pool = None
+
+    def _increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def instrument(self, engine) -> None:
+        self._pool = engine.pool
+        event.listen(engine, "checkout", lambda *args: self._increment("checkouts"))
+        event.listen(engine, "checkin", lambda *args: self._increment("checkins"))
+        event.listen(engine, "connect", lambda *args: self._increment("connects"))
+        event.listen(engine, "invalidate", lambda *args: self._increment("invalidations"))
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self._pool
+        stats = {
+            "pool": type(pool).__name__ if pool is not None else None,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "checkout_wait": self.checkout_wait.summary(),
+        }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                {
+                    "size": pool.size(),
+                    "checked_in": pool.checkedin(),
+                    "checked_out": pool.checkedout(),
+                    "overflow": max(0, pool.overflow()),
+                }
+            )
+        return stats
+
+
+class _TimedPoolMixin:
+    """Mide el tiempo de espera de cada checkout. Se configura vía `pool_monitor`."""
+
+    pool_monitor: PoolMonitor = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.pool_monitor._increment("timeouts")
+            raise
+        finally:
+            self.pool_monitor.checkout_wait.observe(time.perf_counter() - start)
+
+
+def timed_pool_class(pool_class, monitor: PoolMonitor):
+    """Devuelve una subclase de `pool_class` que reporta sus esperas en `monitor`."""
+    return type(
+        f"Timed{pool_class.__name__}",
+        (_TimedPoolMixin, pool_class),
+        {"pool_monitor": monitor},
+    )
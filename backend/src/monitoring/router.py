@@ -0,0 +1,45 @@
+import hmac
+from typing import Any, Dict
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import PlainTextResponse
+from src.auth.dependencies import has_admin_role
+from src.monitoring import exceptions, service
+from src.monitoring.tracing import prometheus_text
+from src.settings import METRICS_SCRAPE_TOKEN
+from src.users import schemas as users_schemas
+
+router = APIRouter(prefix="/monitoring", tags=["monitoring"])
+
+
+@router.get("/metrics")
+async def read_metrics(
+    user: users_schemas.User = Depends(has_admin_role),
+) -> Dict[str, Dict[str, Any]]:
+    return service.collect()
+
+
+@router.get("/metrics/{name}")
+async def read_metric(
+    name: str,
+    user: users_schemas.User = Depends(has_admin_role),
+) -> Dict[str, Any]:
+    return service.collect_one(name)
+
+
+def check_scrape_token(request: Request) -> None:
+    if METRICS_SCRAPE_TOKEN is None:
+        raise exceptions.PrometheusDisabled()
+    authorization = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {METRICS_SCRAPE_TOKEN}".encode()):
+        raise exceptions.InvalidScrapeToken()
+
+
+@router.get(
+    "/prometheus",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(check_scrape_token)],
+)
+async def read_prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        prometheus_text(service.collect()), media_type="text/plain; version=0.0.4"
+    )
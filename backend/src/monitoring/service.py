@@ -0,0 +1,61 @@
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List
+from src.monitoring import exceptions
+
+_collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_collector(name: str, collector: Callable[[], Dict[str, Any]]) -> None:
+    """Registra una función que devuelve las métricas de un subsistema bajo `name`."""
+    _collectors[name] = collector
+
+
+def collect() -> Dict[str, Dict[str, Any]]:
+    """Devuelve una instantánea de las métricas de todos los subsistemas registrados."""
+    return {name: collector() for name, collector in _collectors.items()}
+
+
+def collect_one(name: str) -> Dict[str, Any]:
+    collector = _collectors.get(name)
+    if collector is None:
+        raise exceptions.CollectorNotFound()
+    return collector()
+
+
+def _percentile(sorted_samples: List[float], percentile: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(percentile * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+class LatencyRecorder:
+    """Acumula duraciones (en segundos) y resume percentiles sobre las muestras más recientes."""
+
+    def __init__(self, window: int = 1024) -> None:
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total, maximum = self.count, self.total, self.max
+        return {
+            "count": count,
+            "avg_ms": (total / count * 1000) if count else 0.0,
+            "max_ms": maximum * 1000,
+            "p50_ms": _percentile(samples, 0.50) * 1000,
+            "p95_ms": _percentile(samples, 0.95) * 1000,
+            "p99_ms": _percentile(samples, 0.99) * 1000,
+        }
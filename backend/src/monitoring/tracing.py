@@ -0,0 +1,311 @@
+"""Tiempos por etapa de cada request (decodificación de JWT, consultas a la DB,
+hashing de contraseñas, dependencias de FastAPI), etiquetados por ruta.
+
+Cada etapa se acumula en un histograma por (etapa, ruta) que se publica en formato
+Prometheus. Si TRACE_EXPORT_FILE está definido, además se exporta cada etapa como
+un span (campos al estilo OpenTelemetry) en un archivo JSONL, con un trace por
+request y la jerarquía de spans anidados.
+"""
+import functools
+import inspect
+import json
+import queue
+import random
+import secrets
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from sqlalchemy import event
+from src.settings import TRACE_EXPORT_FILE, TRACE_SAMPLE_RATE
+from src.monitoring.service import register_collector
+
+# límites (en segundos) de los buckets de los histogramas
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class TraceContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+# scope ASGI del request en curso: el router completa scope["route"] al resolver la
+# ruta, por lo que la etiqueta está disponible desde las dependencias en adelante
+_request_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_scope", default=None)
+_trace: ContextVar[Optional[TraceContext]] = ContextVar("trace", default=None)
+
+
+def current_route() -> str:
+    scope = _request_scope.get()
+    if scope is None:
+        return "-"  # fuera de un request (p. ej. tareas periódicas)
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(BUCKETS) + 1)  # el último es +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class StageTimings:
+    """Histogramas de duración indexados por (etapa, ruta)."""
+
+    def __init__(self) -> None:
+        self._series: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, route: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._series.get((stage, route))
+            if histogram is None:
+                histogram = self._series[(stage, route)] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self) -> Dict[Tuple[str, str], Histogram]:
+        with self._lock:
+            snapshot = {}
+            for key, histogram in self._series.items():
+                copy = snapshot[key] = Histogram()
+                copy.buckets = list(histogram.buckets)
+                copy.count, copy.sum = histogram.count, histogram.sum
+            return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {}
+        for (stage, route), histogram in sorted(self.snapshot().items()):
+            stats.setdefault(route, {})[stage] = {
+                "count": histogram.count,
+                "avg_ms": histogram.sum / histogram.count * 1000 if histogram.count else 0.0,
+            }
+        return stats
+
+
+class JsonlSpanExporter:
+    """Escribe los spans como líneas JSON desde un hilo propio, para no bloquear el
+    event loop. Si la cola se llena, descarta spans en lugar de frenar los requests.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000) -> None:
+        self.path = path
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as file:
+            while True:
+                span = self._queue.get()
+                if span is None:
+                    return
+                file.write(json.dumps(span, separators=(",", ":")) + "\n")
+                self.exported += 1
+                if self._queue.empty():
+                    file.flush()
+
+    def export(self, span: Dict[str, Any]) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="span-exporter", daemon=True
+                    )
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+        }
+
+
+stage_timings = StageTimings()
+register_collector("stages", stage_timings.stats)
+span_exporter = JsonlSpanExporter(TRACE_EXPORT_FILE) if TRACE_EXPORT_FILE else None
+if span_exporter is not None:
+    register_collector("span_exporter", span_exporter.stats)
+
+
+def _export(
+    trace: TraceContext,
+    span_id: str,
+    name: str,
+    start_ns: int,
+    duration: float,
+    attributes: Dict[str, Any],
+) -> None:
+    span_exporter.export(
+        {
+            "traceId": trace.trace_id,
+            "spanId": span_id,
+            "parentSpanId": trace.span_id,
+            "name": name,
+            "startTimeUnixNano": start_ns,
+            "endTimeUnixNano": start_ns + int(duration * 1e9),
+            "attributes": {"http.route": current_route(), **attributes},
+        }
+    )
+
+
+def record(name: str, start_ns: int, duration: float, **attributes: Any) -> None:
+    """Registra una etapa ya medida (sin spans hijos)."""
+    stage_timings.observe(name, current_route(), duration)
+    trace = _trace.get()
+    if span_exporter is not None and trace is not None and trace.sampled:
+        _export(trace, secrets.token_hex(8), name, start_ns, duration, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+    """Mide el bloque como la etapa `name`; los spans abiertos dentro quedan como hijos."""
+    parent = _trace.get()
+    exporting = span_exporter is not None and parent is not None and parent.sampled
+    token = None
+    if exporting:
+        span_id = secrets.token_hex(8)
+        token = _trace.set(TraceContext(parent.trace_id, span_id, True))
+    start_ns, start = time.time_ns(), time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        if token is not None:
+            _trace.reset(token)
+        stage_timings.observe(name, current_route(), duration)
+        if exporting:
+            _export(parent, span_id, name, start_ns, duration, attributes)
+
+
+def traced(name: str) -> Callable:
+    """Decorador que mide cada llamada como la etapa `name`. Conserva la firma, por lo
+    que puede aplicarse a dependencias de FastAPI (sync o async).
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """Middleware ASGI que abre el trace de cada request y mide su duración total."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        scope_token = _request_scope.set(scope)
+        sampled = span_exporter is not None and random.random() < TRACE_SAMPLE_RATE
+        # el span raíz se exporta con parentSpanId vacío
+        trace_token = _trace.set(TraceContext(secrets.token_hex(16), "", sampled))
+        try:
+            with span("request", method=scope["method"]):
+                await self.app(scope, receive, send)
+        finally:
+            _trace.reset(trace_token)
+            _request_scope.reset(scope_token)
+
+
+def instrument_engine(engine) -> None:
+    """Mide cada sentencia SQL ejecutada por `engine` como la etapa "db.query"."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append((time.time_ns(), time.perf_counter()))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start_ns, start = conn.info["query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+        record("db.query", start_ns, time.perf_counter() - start, **{"db.operation": operation})
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection else None
+        if starts:
+            starts.pop()
+
+
+def _metric_name(*parts: str) -> str:
+    return "_".join(
+        "".join(char if char.isalnum() else "_" for char in part) for part in parts if part
+    )
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _flatten(prefix: str, value: Any, lines: List[str]) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(_metric_name(prefix, str(key)), item, lines)
+    elif isinstance(value, (int, float)):
+        lines.append(f"# TYPE {prefix} gauge")
+        lines.append(f"{prefix} {float(value)}")
+
+
+def prometheus_text(collectors: Dict[str, Dict[str, Any]]) -> str:
+    """Histogramas de etapas y métricas numéricas de los collectors en formato de
+    exposición de texto de Prometheus.
+    """
+    lines = [
+        "# HELP app_stage_duration_seconds Duración de cada etapa del request por ruta.",
+        "# TYPE app_stage_duration_seconds histogram",
+    ]
+    for (stage, route), histogram in sorted(stage_timings.snapshot().items()):
+        labels = f'stage="{_label(stage)}",route="{_label(route)}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), histogram.buckets):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'app_stage_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"app_stage_duration_seconds_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"app_stage_duration_seconds_count{{{labels}}} {histogram.count}")
+    for name, stats in collectors.items():
+        if name != "stages":
+            _flatten(_metric_name("app", name), stats, lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,114 @@
+import math
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+# Ventana deslizante aproximada: se cuentan los intentos de la ventana fija actual
+# y de la anterior, y la anterior se pondera por la fracción que todavía se solapa
+# con los últimos `window` segundos. Usa dos contadores por clave en lugar de
+# guardar cada intento.
+
+
+def sliding_window(
+    previous: int, current: int, limit: int, window: int, elapsed: float
+) -> Optional[int]:
+    """Devuelve None si se admite un intento más, o los segundos a esperar."""
+    weight = 1 - elapsed / window
+    if previous * weight + current + 1 <= limit:
+        return None
+    if current + 1 <= limit and previous > 0:
+        # alcanza con que decaiga el aporte de la ventana anterior
+        wait = window * (1 - (limit - 1 - current) / previous) - elapsed
+    else:
+        # hay que esperar a la próxima ventana y a que decaiga la actual
+        wait = (window - elapsed) + window * max(0.0, 1 - (limit - 1) / max(current, 1))
+    return max(1, math.ceil(wait))
+
+
+class MemoryBackend:
+    """Contadores en memoria del proceso (un solo worker)."""
+
+    blocking = False
+
+    def __init__(self) -> None:
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, limit: int, window: int, now: float) -> Optional[int]:
+        start = int(now // window) * window
+        with self._lock:
+            previous = self._counts.get((key, start - window), 0)
+            current = self._counts.get((key, start), 0)
+            retry_after = sliding_window(previous, current, limit, window, now - start)
+            if retry_after is None:
+                self._counts[(key, start)] = current + 1
+            return retry_after
+
+    def purge(self, before: float) -> int:
+        with self._lock:
+            expired = [entry for entry in self._counts if entry[1] < before]
+            for entry in expired:
+                del self._counts[entry]
+        return len(expired)
+
+
+class SQLiteBackend:
+    """Contadores en un archivo SQLite compartido por todos los workers del host.
+
+    Cada intento se resuelve en una transacción `BEGIN IMMEDIATE`, por lo que la
+    lectura y el incremento son atómicos entre procesos.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_counters ("
+                "key TEXT NOT NULL, window_start INTEGER NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (key, window_start)) WITHOUT ROWID"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key: str, limit: int, window: int, now: float) -> Optional[int]:
+        start = int(now // window) * window
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            counts = dict(
+                conn.execute(
+                    "SELECT window_start, count FROM rate_limit_counters "
+                    "WHERE key = ? AND window_start IN (?, ?)",
+                    (key, start - window, start),
+                ).fetchall()
+            )
+            retry_after = sliding_window(
+                counts.get(start - window, 0), counts.get(start, 0), limit, window, now - start
+            )
+            if retry_after is None:
+                conn.execute(
+                    "INSERT INTO rate_limit_counters (key, window_start, count) VALUES (?, ?, 1) "
+                    "ON CONFLICT (key, window_start) DO UPDATE SET count = count + 1",
+                    (key, start),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+    def purge(self, before: float) -> int:
+        conn = self._connection()
+        return conn.execute(
+            "DELETE FROM rate_limit_counters WHERE window_start < ?", (before,)
+        ).rowcount
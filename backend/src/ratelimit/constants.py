@@ -0,0 +1,2 @@
+class ErrorCode:
+    TOO_MANY_LOGIN_ATTEMPTS = "Demasiados intentos de inicio de sesión. Intenta nuevamente más tarde."
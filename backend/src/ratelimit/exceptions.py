@@ -0,0 +1,6 @@
+from src.ratelimit.constants import ErrorCode
+from src.exceptions import TooManyRequests
+
+
+class LoginRateLimited(TooManyRequests):
+    DETAIL = ErrorCode.TOO_MANY_LOGIN_ATTEMPTS
@@ -0,0 +1,116 @@
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+from starlette.concurrency import run_in_threadpool
+from src.monitoring.service import register_collector
+from src.ratelimit.backends import MemoryBackend, SQLiteBackend
+from src.scheduler import PeriodicTask, scheduler
+from src.settings import (
+    LOGIN_RATE_LIMIT_PER_IP,
+    LOGIN_RATE_LIMIT_PER_USERNAME,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_SQLITE_PATH,
+)
+
+
+class Rule(NamedTuple):
+    name: str
+    limit: int
+    window: int
+
+
+def parse_rule(name: str, value: Optional[str]) -> Optional[Rule]:
+    """Convierte "<intentos>/<segundos>" (p. ej. "10/60") en una Rule; vacío o "0" la deshabilita."""
+    if not value or value.strip() == "0":
+        return None
+    limit, _, window = value.partition("/")
+    return Rule(name, int(limit), int(window or 60))
+
+
+def get_backend(kind: str, path: str):
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(path)
+    raise ValueError(f"Backend de rate limiting inválido: {kind}")
+
+
+class RateLimiter:
+    """Aplica varias reglas de ventana deslizante sobre un mismo backend.
+
+    `hit` recibe el valor de cada regla (p. ej. {"ip": "10.0.0.1"}) y devuelve
+    None si el intento se admite, o los segundos que hay que esperar. Un intento
+    rechazado no suma a los contadores.
+    """
+
+    def __init__(self, backend, rules: List[Rule]) -> None:
+        self.backend = backend
+        self.rules = rules
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = {rule.name: 0 for rule in rules}
+
+    def _hit(self, values: Dict[str, str]) -> Optional[int]:
+        now = time.time()
+        for rule in self.rules:
+            value = values.get(rule.name)
+            if value is None:
+                continue
+            retry_after = self.backend.acquire(
+                f"{rule.name}:{value}", rule.limit, rule.window, now
+            )
+            if retry_after is not None:
+                with self._lock:
+                    self.rejected[rule.name] += 1
+                return retry_after
+        with self._lock:
+            self.allowed += 1
+        return None
+
+    async def hit(self, values: Dict[str, str]) -> Optional[int]:
+        if not self.rules:
+            return None
+        if self.backend.blocking:
+            return await run_in_threadpool(self._hit, values)
+        return self._hit(values)
+
+    def purge(self) -> int:
+        if not self.rules:
+            return 0
+        horizon = 2 * max(rule.window for rule in self.rules)
+        return self.backend.purge(time.time() - horizon)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "rules": {rule.name: f"{rule.limit}/{rule.window}s" for rule in self.rules},
+            "allowed": self.allowed,
+            "rejected": dict(self.rejected),
+        }
+
+
+login_limiter = RateLimiter(
+    get_backend(RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH),
+    [
+        rule
+        for rule in (
+            # la regla por IP va primero: los intentos rechazados por usuario
+            # también cuentan para la IP que los origina
+            parse_rule("ip", LOGIN_RATE_LIMIT_PER_IP),
+            parse_rule("username", LOGIN_RATE_LIMIT_PER_USERNAME),
+        )
+        if rule is not None
+    ],
+)
+register_collector("login_rate_limit", login_limiter.stats)
+
+
+async def _purge_login_limiter() -> int:
+    if login_limiter.backend.blocking:
+        return await run_in_threadpool(login_limiter.purge)
+    return login_limiter.purge()
+
+
+login_limiter_sweeper = scheduler.add(
+    PeriodicTask("login_rate_limit_sweeper", 300, _purge_login_limiter)
+)
@@ -0,0 +1,101 @@
+import asyncio
+import contextlib
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from src.monitoring.service import LatencyRecorder, register_collector
+
+
+class PeriodicTask:
+    """Tarea de mantenimiento que se ejecuta cada `interval` segundos en el event loop.
+
+    Si `fn` devuelve un entero se interpreta como la cantidad de elementos
+    procesados (p. ej. filas eliminadas) y se acumula en las métricas. Un error en
+    una ejecución se registra y no detiene las siguientes.
+    """
+
+    def __init__(
+        self, name: str, interval: float, fn: Callable[[], Awaitable[Any]]
+    ) -> None:
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.duration = LatencyRecorder()
+        self.runs = 0
+        self.errors = 0
+        self.processed = 0
+        self.last_processed: Optional[int] = None
+        self.last_run_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await self.fn()
+        except Exception as error:
+            self.errors += 1
+            self.last_error = repr(error)
+            return None
+        finally:
+            self.runs += 1
+            self.last_run_at = time.time()
+            self.duration.observe(time.perf_counter() - start)
+        if isinstance(result, int):
+            self.processed += result
+            self.last_processed = result
+        return result
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop(), name=self.name)
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "running": self._task is not None,
+            "runs": self.runs,
+            "errors": self.errors,
+            "processed": self.processed,
+            "last_processed": self.last_processed,
+            "last_run_at": self.last_run_at,
+            "last_error": self.last_error,
+            "duration": self.duration.summary(),
+        }
+
+
+class Scheduler:
+    """Conjunto de tareas periódicas que se inician y detienen con la app."""
+
+    def __init__(self) -> None:
+        self.tasks: List[PeriodicTask] = []
+
+    def add(self, task: PeriodicTask) -> PeriodicTask:
+        self.tasks.append(task)
+        return task
+
+    def start(self) -> None:
+        for task in self.tasks:
+            task.start()
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            await task.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {task.name: task.stats() for task in self.tasks}
+
+
+scheduler = Scheduler()
+register_collector("scheduler", scheduler.stats)
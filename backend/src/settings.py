@@ -12,12 +12,80 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS"))
 TOKEN_URL = os.getenv("TOKEN_URL")
 DB_URL = os.getenv("DB_URL")
+# modo async: AsyncSession sobre un driver async (por defecto se deriva de DB_URL, p. ej. sqlite+aiosqlite)
+DB_ASYNC = os.getenv("DB_ASYNC", "False").lower() == "true"
+ASYNC_DB_URL = os.getenv("ASYNC_DB_URL")
+# pool de conexiones (no aplica a SQLite en memoria)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "False").lower() == "true"
+# conexiones que se abren al iniciar la app (por defecto, el tamaño del pool)
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", DB_POOL_SIZE))
 ROOT_PATH = os.getenv("ROOT_PATH")
 MAIN_SITE_DOMAIN = os.getenv(f"MAIN_SITE_DOMAIN_{ENV}")
 API_SITE_DOMAIN = os.getenv(f"API_SITE_DOMAIN_{ENV}")
 SECURE_COOKIES = bool(os.getenv("SECURE_COOKIES"))
 REFRESH_TOKEN_COOKIE_NAME = os.getenv("REFRESH_TOKEN_COOKIE_NAME")
 ACCESS_TOKEN_COOKIE_NAME = os.getenv("ACCESS_TOKEN_COOKIE_NAME")
+# parámetros de Argon2id para los hashes nuevos (calibrar con `python -m src.auth.calibrate`).
+# Los hashes con otros parámetros se actualizan en el siguiente login correcto.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 3))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 65536))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 4))
+# pool para hashing de contraseñas (Argon2): "thread" o "process"
+HASHING_EXECUTOR = os.getenv("HASHING_EXECUTOR", "thread")
+HASHING_MAX_WORKERS = int(os.getenv("HASHING_MAX_WORKERS", os.cpu_count() or 1))
+HASHING_MAX_QUEUE = int(os.getenv("HASHING_MAX_QUEUE", 64))
+# procesos usados para hashear contraseñas en importaciones masivas de usuarios (se
+# suman a HASHING_MAX_WORKERS; se procesa una importación a la vez)
+BULK_IMPORT_HASH_WORKERS = int(os.getenv("BULK_IMPORT_HASH_WORKERS", os.cpu_count() or 1))
+# cantidad máxima de access tokens verificados en memoria (0 deshabilita el cache)
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", 10000))
+# aceptar tokens emitidos con el formato anterior de claims (User completo en "sub")
+ACCEPT_LEGACY_TOKENS = os.getenv("ACCEPT_LEGACY_TOKENS", "True").lower() == "true"
+# claves de firma de los JWT con su calendario de rotación (ver src/auth/keys.py).
+# JWT_KEYS_FILE tiene prioridad sobre JWT_KEYS; sin ninguno se usan SECRET_KEY y REFRESH_SECRET_KEY.
+JWT_KEYS_FILE = os.getenv("JWT_KEYS_FILE") or None
+JWT_KEYS = os.getenv("JWT_KEYS") or None
+# clave privada PEM de los access tokens cuando ALGORITHM es asimétrico (RS256, EdDSA, ...)
+# y no se configuran JWT_KEYS_FILE / JWT_KEYS
+JWT_PRIVATE_KEY_FILE = os.getenv("JWT_PRIVATE_KEY_FILE") or None
+# segundos que los consumidores pueden cachear /.well-known/jwks.json
+JWKS_MAX_AGE = int(os.getenv("JWKS_MAX_AGE", 300))
+# segundos entre relecturas del archivo de claves y evaluaciones del calendario de rotación
+JWT_KEYS_RELOAD_INTERVAL = float(os.getenv("JWT_KEYS_RELOAD_INTERVAL", 60))
+# persistir los refresh tokens (rotación con detección de reuso y revocación al cerrar sesión)
+REFRESH_TOKEN_STORE = os.getenv("REFRESH_TOKEN_STORE", "True").lower() == "true"
+REFRESH_TOKEN_SWEEP_INTERVAL = float(os.getenv("REFRESH_TOKEN_SWEEP_INTERVAL", 3600))
+REFRESH_TOKEN_SWEEP_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_SWEEP_BATCH_SIZE", 1000))
+# segundos durante los que un refresh token recién rotado puede volver a usarse (refresh
+# concurrentes del mismo cliente) sin considerarse robado; 0 deshabilita la tolerancia
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = float(os.getenv("REFRESH_TOKEN_REUSE_GRACE_SECONDS", 10))
+# agrupar los intentos de login idénticos concurrentes en una sola verificación
+LOGIN_SINGLE_FLIGHT = os.getenv("LOGIN_SINGLE_FLIGHT", "True").lower() == "true"
+# spans de cada request en formato JSONL (vacío deshabilita) y fracción de requests exportados
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE") or None
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+# token para GET /monitoring/prometheus ("Authorization: Bearer <token>"); vacío deshabilita el endpoint
+METRICS_SCRAPE_TOKEN = os.getenv("METRICS_SCRAPE_TOKEN") or None
+# límites de intentos de login por usuario y por IP, "<intentos>/<segundos>" ("0" deshabilita)
+LOGIN_RATE_LIMIT_PER_USERNAME = os.getenv("LOGIN_RATE_LIMIT_PER_USERNAME", "10/60")
+LOGIN_RATE_LIMIT_PER_IP = os.getenv("LOGIN_RATE_LIMIT_PER_IP", "100/60")
+# "memory" (un solo worker) o "sqlite" (contadores compartidos entre workers del mismo host)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "rate_limits.db")
+# filtro de Bloom de usernames para rechazar logins de usuarios inexistentes sin consultar la DB:
+# tasa de falsos positivos, segundos entre actualizaciones incrementales (altas y renombres de
+# otros workers) y entre reconstrucciones completas (bajas)
+USERNAME_FILTER_ENABLED = os.getenv("USERNAME_FILTER_ENABLED", "True").lower() == "true"
+USERNAME_FILTER_ERROR_RATE = float(os.getenv("USERNAME_FILTER_ERROR_RATE", 0.01))
+USERNAME_FILTER_REFRESH_INTERVAL = float(os.getenv("USERNAME_FILTER_REFRESH_INTERVAL", 5))
+USERNAME_FILTER_REBUILD_INTERVAL = float(os.getenv("USERNAME_FILTER_REBUILD_INTERVAL", 3600))
+# limpieza periódica de tokens de recuperación vencidos (segundos entre barridos; 0 la deshabilita)
+RECOVERY_TOKEN_SWEEP_INTERVAL = float(os.getenv("RECOVERY_TOKEN_SWEEP_INTERVAL", 300))
+RECOVERY_TOKEN_SWEEP_BATCH_SIZE = int(os.getenv("RECOVERY_TOKEN_SWEEP_BATCH_SIZE", 1000))
 
 def get_base_cookie_config(key: str) -> Dict:
     return {
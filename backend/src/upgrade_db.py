@@ -0,0 +1,128 @@
+"""Actualiza el esquema de una base existente al de los modelos actuales.
+
+`Base.metadata.create_all` crea las tablas que faltan pero no modifica las que ya
+existen. Cada paso de `UPGRADES` detecta si ya fue aplicado, por lo que el proceso
+es idempotente; se ejecuta al iniciar la app y también puede correrse a mano:
+
+    python -m src.upgrade_db
+"""
+import asyncio
+from typing import Callable, List, Set
+from sqlalchemy import Connection, inspect, text
+from src.database import Base, async_engine, engine
+from src.auth.models import AuthPasswordRecoveryToken as RecoveryToken
+from src.auth.utils import token_digest
+from src.users import models as users_models
+
+
+def _columns(conn: Connection, table: str) -> Set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _index_names(conn: Connection, table: str) -> Set[str]:
+    if conn.dialect.name == "sqlite":
+        # el inspector de SQLite omite los índices sobre expresiones (lower(email))
+        return set(
+            conn.scalars(
+                text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+                {"table": table},
+            )
+        )
+    return {index["name"] for index in inspect(conn).get_indexes(table)}
+
+
+def hash_recovery_tokens(conn: Connection) -> bool:
+    """Reemplaza la columna `recovery_token` (el token en claro) por `token_digest`."""
+    table = RecoveryToken.__tablename__
+    columns = _columns(conn, table)
+    if "recovery_token" not in columns:
+        return False
+    if "token_digest" not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN token_digest VARCHAR(64)"))
+
+    rows = conn.execute(
+        text(f"SELECT id, recovery_token FROM {table} WHERE token_digest IS NULL")
+    ).all()
+    digests, seen, duplicated = {}, set(), []
+    for row_id, token in rows:
+        digest = token_digest(token)
+        if digest in seen:
+            # el índice único no admite repetidos; basta con conservar uno
+            duplicated.append({"id": row_id})
+        else:
+            seen.add(digest)
+            digests[row_id] = digest
+    if duplicated:
+        conn.execute(text(f"DELETE FROM {table} WHERE id = :id"), duplicated)
+    if digests:
+        conn.execute(
+            text(f"UPDATE {table} SET token_digest = :digest WHERE id = :id"),
+            [{"id": row_id, "digest": digest} for row_id, digest in digests.items()],
+        )
+    conn.execute(text(f"ALTER TABLE {table} DROP COLUMN recovery_token"))
+    return True
+
+
+def add_token_version(conn: Connection) -> bool:
+    """Agrega `user.token_version` (0 para los usuarios existentes)."""
+    table = users_models.User.__tablename__
+    if "token_version" in _columns(conn, table):
+        return False
+    quoted = conn.dialect.identifier_preparer.quote(table)
+    conn.execute(
+        text(f"ALTER TABLE {quoted} ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0")
+    )
+    return True
+
+
+def add_username_changed_at(conn: Connection) -> bool:
+    """Agrega `user.username_changed_at` (nulo para los usuarios existentes, que la
+    reconstrucción del filtro de usernames ya incluye).
+    """
+    table = users_models.User.__tablename__
+    if "username_changed_at" in _columns(conn, table):
+        return False
+    quoted = conn.dialect.identifier_preparer.quote(table)
+    column_type = users_models.User.username_changed_at.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {quoted} ADD COLUMN username_changed_at {column_type}"))
+    return True
+
+
+def create_missing_indexes(conn: Connection) -> bool:
+    """Crea los índices declarados en los modelos que no existen en la base."""
+    created = False
+    for table in Base.metadata.sorted_tables:
+        existing = _index_names(conn, table.name)
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                created = True
+    return created
+
+
+# Se aplican en orden, luego de crear las tablas faltantes.
+UPGRADES: List[Callable[[Connection], bool]] = [
+    hash_recovery_tokens,
+    add_token_version,
+    add_username_changed_at,
+    create_missing_indexes,
+]
+
+
+def upgrade(conn: Connection) -> List[str]:
+    """Aplica los pasos pendientes y devuelve los nombres de los que hicieron cambios."""
+    Base.metadata.create_all(bind=conn)
+    return [step.__name__ for step in UPGRADES if step(conn)]
+
+
+async def upgrade_database() -> List[str]:
+    if async_engine is not None:
+        async with async_engine.begin() as conn:
+            return await conn.run_sync(upgrade)
+    with engine.begin() as conn:
+        return upgrade(conn)
+
+
+if __name__ == "__main__":
+    applied = asyncio.run(upgrade_database())
+    print(f"Pasos aplicados: {', '.join(applied)}" if applied else "El esquema está actualizado")
@@ -7,3 +7,27 @@ class ErrorCode:
         "La contraseña es muy corta, debe contar con al menos 8 caracteres"
     )
     USER_CANNOT_DELETE_ITSELF = "El usuario no puede eliminarse a sí mismo"
+    USER_LIST_FORBIDDEN = "El usuario no tiene permisos para listar usuarios"
+    USERNAME_DUPLICATED = "El username está repetido en los datos importados"
+    USER_NOT_INSERTED = "El usuario no pudo ser creado"
+    IMPORT_TOO_LARGE = "La importación supera la cantidad máxima de usuarios permitida"
+    IMPORT_INVALID_FILE = "El archivo debe ser un CSV en UTF-8 con columnas username, email y password"
+
+
+class Pagination:
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+    NEXT_CURSOR_HEADER = "X-Next-Cursor"
+    TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+class Import:
+    # filas insertadas por transacción
+    CHUNK_SIZE = 500
+    MAX_ROWS = 10000
+
+
+class Export:
+    # filas por lote leídas del cursor y escritas en la respuesta
+    CHUNK_SIZE = 1000
+    COLUMNS = ("id", "username", "email", "role_id", "role_name")
@@ -18,5 +18,17 @@ class UserCannotDeleteItself(PermissionDenied):
     DETAIL = ErrorCode.USER_CANNOT_DELETE_ITSELF
 
 
+class UserListForbidden(PermissionDenied):
+    DETAIL = ErrorCode.USER_LIST_FORBIDDEN
+
+
+class ImportTooLarge(BadRequest):
+    DETAIL = ErrorCode.IMPORT_TOO_LARGE
+
+
+class ImportInvalidFile(BadRequest):
+    DETAIL = ErrorCode.IMPORT_INVALID_FILE
+
+
 class RoleNotFound(NotFound):
     DETAIL = ErrorCode.ROLE_NOT_FOUND
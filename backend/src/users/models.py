@@ -1,6 +1,7 @@
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import ForeignKey, Index, String, func
 from sqlalchemy.orm import relationship, mapped_column, Mapped
 from pydantic import EmailStr
+from datetime import datetime
 from typing import Optional
 from src.database import Base
 
@@ -11,19 +12,34 @@ class User(Base):
     username: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     email: Mapped[EmailStr] = mapped_column(String(255))
     hashed_password: Mapped[str] = mapped_column(String(255))
+    # se incrementa al cambiar la contraseña o el rol; los tokens emitidos con una
+    # versión anterior dejan de ser válidos
+    token_version: Mapped[int] = mapped_column(default=0, server_default="0")
+    # momento (según el reloj de la DB) del alta o del último cambio de username; con
+    # él `UsernameFilter.refresh` incorpora las altas y renombres de otros workers
+    username_changed_at: Mapped[Optional[datetime]] = mapped_column(
+        default=func.now(), index=True
+    )
 
     role_id: Mapped[Optional[int]] = mapped_column(ForeignKey("role.id"))
-    role: Mapped[Optional["Role"]] = relationship("Role")
+    # joined: el rol se carga junto al usuario (role_name no dispara lazy loads,
+    # que en modo async no están permitidos fuera de run_sync).
+    role: Mapped[Optional["Role"]] = relationship("Role", lazy="joined")
 
     @property
     def is_admin(self):
-        return self.role_id == 1
+        return self.role is not None and self.role.name == "admin"
 
     @property
     def role_name(self):
         return self.role.name
 
 
+# Los emails se buscan sin distinguir mayúsculas: el índice es sobre lower(email)
+# y las consultas deben comparar `func.lower(User.email)` para poder usarlo.
+Index("ix_user_email_lower", func.lower(User.email))
+
+
 class Role(Base):
     __tablename__ = "role"
 
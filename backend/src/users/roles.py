@@ -0,0 +1,61 @@
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from src.users import models
+
+
+class RoleRegistry:
+    """Mapeo inmutable nombre de rol -> id, mantenido en memoria.
+
+    Se carga al iniciar la app y se actualiza cuando una sesión confirma altas,
+    modificaciones o bajas de roles, por lo que los controles de autorización no
+    necesitan consultar la DB.
+    """
+
+    def __init__(self) -> None:
+        self._ids: Mapping[str, int] = MappingProxyType({})
+
+    @property
+    def ids(self) -> Mapping[str, int]:
+        return self._ids
+
+    def get_id(self, name: str) -> Optional[int]:
+        return self._ids.get(name)
+
+    def load(self, db: Session) -> None:
+        rows = db.execute(select(models.Role.name, models.Role.id)).all()
+        self._ids = MappingProxyType({name: role_id for name, role_id in rows})
+
+    def apply(self, upserted: Dict[int, str], deleted: Dict[int, str]) -> None:
+        touched = set(upserted) | set(deleted)
+        ids = {name: role_id for name, role_id in self._ids.items() if role_id not in touched}
+        ids.update({name: role_id for role_id, name in upserted.items()})
+        self._ids = MappingProxyType(ids)
+
+
+role_registry = RoleRegistry()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_role_changes(session: Session, flush_context) -> None:
+    upserted, deleted = session.info.setdefault("role_changes", ({}, {}))
+    for obj in session.new | session.dirty:
+        if isinstance(obj, models.Role):
+            upserted[obj.id] = obj.name
+    for obj in session.deleted:
+        if isinstance(obj, models.Role):
+            upserted.pop(obj.id, None)
+            deleted[obj.id] = obj.name
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_role_changes(session: Session) -> None:
+    changes = session.info.pop("role_changes", None)
+    if changes is not None:
+        role_registry.apply(*changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_role_changes(session: Session) -> None:
+    session.info.pop("role_changes", None)
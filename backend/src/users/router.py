@@ -1,33 +1,72 @@
-from fastapi import Depends, APIRouter, HTTPException, Path
+from fastapi import Body, Depends, APIRouter, File, HTTPException, Path, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, Dict, List, Optional
 from src.auth.dependencies import (
     get_current_user,
     has_admin_role,
     has_access_to_user
 )
-from src.database import get_db
+from src.database import get_db, run_db
 from src.users import service, schemas, utils, exceptions
+from src.users.constants import Export, Pagination
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.get("/", response_model=List[schemas.User])
-def read_users(
+async def read_users(
+    response: Response,
+    filters: schemas.UserFilters = Depends(),
+    limit: int = Query(Pagination.DEFAULT_PAGE_SIZE, ge=1, le=Pagination.MAX_PAGE_SIZE),
+    after: Optional[int] = Query(None, description="id del último usuario de la página anterior"),
+    include_total: bool = False,
     db: Session = Depends(get_db),
     user: schemas.User = Depends(has_admin_role),
 ):
-    users = service.get_users(db, user)
+    """Lista usuarios paginando por cursor: el header X-Next-Cursor indica el valor
+    de `after` para pedir la página siguiente. Con `include_total`, el header
+    X-Total-Count informa la cantidad total de usuarios que cumplen los filtros.
+    """
+    users, next_cursor = await run_db(
+        db, service.get_users, user, filters, limit=limit, after=after
+    )
+    if next_cursor is not None:
+        response.headers[Pagination.NEXT_CURSOR_HEADER] = str(next_cursor)
+    if include_total:
+        total = await run_db(db, service.count_users, filters)
+        response.headers[Pagination.TOTAL_COUNT_HEADER] = str(total)
     return users
 
 
+@router.get("/export")
+async def export_users(
+    format: schemas.ExportFormat = schemas.ExportFormat.ndjson,
+    db: Session = Depends(get_db),
+    user: schemas.User = Depends(has_admin_role),
+) -> StreamingResponse:
+    """Exporta todos los usuarios en NDJSON o CSV, transmitiendo la respuesta por
+    lotes a medida que se leen de la DB (memoria constante).
+    """
+    chunks = service.stream_user_rows(db, chunk_size=Export.CHUNK_SIZE)
+    if format == schemas.ExportFormat.csv:
+        body, media_type = utils.encode_csv(chunks), "text/csv"
+    else:
+        body, media_type = utils.encode_ndjson(chunks), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{format.value}"'},
+    )
+
+
 @router.get("/{user_id}", response_model=schemas.User)
-def read_user(
+async def read_user(
     user_id: int = Depends(has_access_to_user),
     db: Session = Depends(get_db),
     user: schemas.User = Depends(get_current_user),
 ):
-    db_user = service.get_user(db, user_id=user_id)
+    db_user = await run_db(db, service.get_user, user_id=user_id)
     return db_user
 
 
@@ -37,30 +76,47 @@ async def create_user(
     db: Session = Depends(get_db),
     auth_user = Depends(has_admin_role)
 ):
-    return service.create_user(db, user)
+    return await service.create_user(db, user)
+
+
+@router.post("/import", response_model=schemas.UserImportReport)
+async def import_users(
+    rows: List[Dict[str, Any]] = Body(..., description="Usuarios con username, email y password"),
+    db: Session = Depends(get_db),
+    auth_user=Depends(has_admin_role),
+):
+    return await service.import_users(db, rows)
+
+
+@router.post("/import/csv", response_model=schemas.UserImportReport)
+async def import_users_csv(
+    file: UploadFile = File(..., description="CSV con columnas username, email y password"),
+    db: Session = Depends(get_db),
+    auth_user=Depends(has_admin_role),
+):
+    rows = utils.parse_csv_rows(await file.read())
+    return await service.import_users(db, rows)
 
 
 @router.patch("/{user_id}", response_model=schemas.User)
-def update_user(
+async def update_user(
     user: schemas.UserUpdate,
     user_id: int = Depends(has_access_to_user),
     db: Session = Depends(get_db),
 ):
-    db_user = read_user(user_id, db)
-    updated_user = service.update_user(db, db_user, updated_user=user)
+    updated_user = await service.update_user(db, user_id, updated_user=user)
     return updated_user
 
 
 @router.delete("/{user_id}", response_model=schemas.UserDelete)
-def delete_user(
+async def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
     user: schemas.User = Depends(has_admin_role),
 ):
     if user_id == user.id:
         raise exceptions.UserCannotDeleteItself()
-    db_user = read_user(user_id, db)
-    deleted_user_user_id = service.delete_user(db, db_user)
+    deleted_user_user_id = await run_db(db, service.delete_user, user_id)
     if not deleted_user_user_id:
         raise HTTPException(status_code=400, detail="El usuario no pudo ser eliminado")
     return {
@@ -70,10 +126,10 @@ def delete_user(
 
 
 @router.patch("/{user_id}/role", response_model=schemas.User)
-def assign_role(
+async def assign_role(
     user_id: int,
     role_id: int,
     db: Session = Depends(get_db),
     user: schemas.User = Depends(has_admin_role),
 ):
-    return service.assign_role(db=db, user_id=user_id, role_id=role_id)
+    return await run_db(db, service.assign_role, user_id=user_id, role_id=role_id)
@@ -1,6 +1,7 @@
+from enum import Enum
 from re import S
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 
 class UserBase(BaseModel): 
     username: str
@@ -29,6 +30,36 @@ class UserUpdate(BaseModel):
     model_config = {"extra": "ignore"}
 
 
+class UserFilters(BaseModel):
+    role: Optional[str] = None
+    username_prefix: Optional[str] = None
+    email_domain: Optional[str] = None
+
+
+class ImportStatus(str, Enum):
+    created = "created"
+    error = "error"
+
+
+class UserImportResult(BaseModel):
+    row: int
+    username: Optional[str] = None
+    status: ImportStatus
+    id: Optional[int] = None
+    errors: List[str] = []
+
+
+class UserImportReport(BaseModel):
+    created: int
+    failed: int
+    results: List[UserImportResult]
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
 class UserDelete(BaseModel):
     id: int
     msg: str
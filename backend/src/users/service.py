@@ -1,13 +1,23 @@
-from sqlalchemy import select, update
+from pydantic import ValidationError
+from sqlalchemy import delete, false, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Optional
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from src.database import run_db
 from src.auth.utils import get_password_hash
+from src.auth.cache import token_cache, token_versions
+from src.auth.hashing import hash_many
 from src.users import schemas, models, exceptions
+from src.users.constants import ErrorCode, Import
+from src.users.roles import role_registry
+from src.users.usernames import username_filter
 
 
 def check_user_exists(db: Session, user_id: int):
-    user = db.scalars(select(models.User).where(models.User.id == user_id)).first()
-    if not user:
+    user_id = db.scalar(select(models.User.id).where(models.User.id == user_id))
+    if user_id is None:
         raise exceptions.UserNotFound()
 
 
@@ -29,11 +39,23 @@ def check_invalid_password(password: str):
 
 
 def get_user(db: Session, user_id: int) -> models.User:
-    check_user_exists(db, user_id=user_id)
-    user = db.scalars(select(models.User).where(models.User.id == user_id)).first()
+    # Session.get resuelve desde el identity map sin consultar la DB si ya está cargado
+    user = db.get(models.User, user_id)
+    if user is None:
+        raise exceptions.UserNotFound()
     return user
 
 
+def get_users_by_ids(db: Session, user_ids: Sequence[int]) -> Dict[int, models.User]:
+    """Obtiene varios usuarios con una única consulta `IN`, indexados por id."""
+    if not user_ids:
+        return {}
+    users = db.scalars(
+        select(models.User).where(models.User.id.in_(set(user_ids)))
+    ).unique()
+    return {user.id: user for user in users}
+
+
 def get_user_by_username(db: Session, username: str) -> models.User:
     user = db.scalars(
         select(models.User).where(models.User.username == username)
@@ -43,82 +65,298 @@ def get_user_by_username(db: Session, username: str) -> models.User:
     return user
 
 
-def get_users(db: Session, auth_user: models.User):
-    if auth_user.is_admin:
-        return db.scalars(select(models.User))
-    # lanzar excepcion si auth_user no tiene permisos.
+def _user_filter_conditions(filters: schemas.UserFilters) -> list:
+    conditions = []
+    if filters.role is not None:
+        role_id = role_registry.get_id(filters.role)
+        # un rol inexistente no debe coincidir con ningún usuario
+        conditions.append(models.User.role_id == role_id if role_id is not None else false())
+    if filters.username_prefix:
+        conditions.append(
+            models.User.username.startswith(filters.username_prefix, autoescape=True)
+        )
+    if filters.email_domain:
+        conditions.append(
+            models.User.email.endswith(f"@{filters.email_domain}", autoescape=True)
+        )
+    return conditions
+
+
+def get_users(
+    db: Session,
+    auth_user: models.User,
+    filters: schemas.UserFilters,
+    limit: int,
+    after: Optional[int] = None,
+) -> Tuple[List[models.User], Optional[int]]:
+    """Devuelve una página de usuarios ordenada por id (paginación por cursor)
+    y el cursor de la página siguiente, o None si es la última.
+    """
+    if not auth_user.is_admin:
+        raise exceptions.UserListForbidden()
+    query = select(models.User).where(*_user_filter_conditions(filters))
+    if after is not None:
+        query = query.where(models.User.id > after)
+    # se pide un registro extra para saber si existe una página siguiente
+    users = db.scalars(query.order_by(models.User.id).limit(limit + 1)).all()
+    next_cursor = users[limit - 1].id if len(users) > limit else None
+    return users[:limit], next_cursor
+
+
+def count_users(db: Session, filters: schemas.UserFilters) -> int:
+    return db.scalar(
+        select(func.count())
+        .select_from(models.User)
+        .where(*_user_filter_conditions(filters))
+    )
 
 
-def create_user(db: Session, user: schemas.UserCreate):
-    check_username_exists(db, username=user.username)
+async def stream_user_rows(
+    db: Session, chunk_size: int
+) -> AsyncIterator[Sequence[Tuple]]:
+    """Recorre la tabla de usuarios en lotes de `chunk_size` filas sin materializarla:
+    el cursor se lee con `yield_per` (server-side cuando el driver lo soporta).
+    Cada fila contiene las columnas de `constants.Export.COLUMNS`.
+    """
+    query = (
+        select(
+            models.User.id,
+            models.User.username,
+            models.User.email,
+            models.User.role_id,
+            models.Role.name,
+        )
+        .outerjoin(models.Role, models.User.role_id == models.Role.id)
+        .order_by(models.User.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    if isinstance(db, AsyncSession):
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield rows
+    else:
+        result = await run_in_threadpool(db.execute, query)
+        async for rows in iterate_in_threadpool(result.partitions()):
+            yield rows
+
+
+async def create_user(db: Session, user: schemas.UserCreate):
+    await run_db(db, check_username_exists, username=user.username)
     check_invalid_password(password=user.password)
+    hashed_password = await get_password_hash(user.password)
+    return await run_db(db, _insert_user, user, hashed_password)
+
+
+def _insert_user(db: Session, user: schemas.UserCreate, hashed_password: str):
+    default_role_id = role_registry.get_id("user")
+    if default_role_id is None:
+        raise exceptions.RoleNotFound()
 
-    default_role = (
-        db.query(models.Role).filter(models.Role.name == "user").first()
-    ) 
-    
-    hashed_password = get_password_hash(user.password)
     values = user.model_dump()
     values.pop("password")
     db_user = models.User(
         **values,
         hashed_password=hashed_password,
-        role_id=default_role.id
+        role_id=default_role_id
     )
     db.add(db_user)
     db.commit()
+    username_filter.add([db_user.username])
     db.refresh(db_user)
     return db_user
 
 
-def update_user(
+def _existing_usernames(db: Session, usernames: List[str]) -> set:
+    existing = set()
+    for start in range(0, len(usernames), Import.CHUNK_SIZE):
+        chunk = usernames[start : start + Import.CHUNK_SIZE]
+        existing.update(
+            db.scalars(select(models.User.username).where(models.User.username.in_(chunk)))
+        )
+    return existing
+
+
+def _insert_users_chunk(db: Session, values: List[Dict[str, Any]]) -> Dict[str, int]:
+    try:
+        rows = db.execute(
+            insert(models.User).returning(models.User.id, models.User.username), values
+        ).all()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return {}
+    inserted = {username: user_id for user_id, username in rows}
+    username_filter.add(inserted)
+    return inserted
+
+
+async def import_users(
+    db: Session, rows: List[Dict[str, Any]]
+) -> schemas.UserImportReport:
+    """Crea usuarios en lote: valida todas las filas, detecta usernames repetidos con
+    una única consulta, hashea las contraseñas en paralelo e inserta por lotes de
+    `Import.CHUNK_SIZE` filas (una transacción por lote).
+    """
+    if len(rows) > Import.MAX_ROWS:
+        raise exceptions.ImportTooLarge()
+    default_role_id = role_registry.get_id("user")
+    if default_role_id is None:
+        raise exceptions.RoleNotFound()
+
+    results = [
+        schemas.UserImportResult(row=index, status=schemas.ImportStatus.error)
+        for index in range(1, len(rows) + 1)
+    ]
+    valid: Dict[str, Tuple[schemas.UserImportResult, schemas.UserCreate]] = {}
+    for result, row in zip(results, rows):
+        result.username = row.get("username")
+        try:
+            user = schemas.UserCreate.model_validate(row)
+            check_invalid_password(user.password)
+        except ValidationError as e:
+            result.errors = [
+                f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+                for error in e.errors()
+            ]
+            continue
+        except exceptions.UserInvalidPassword as e:
+            result.errors = [e.detail]
+            continue
+        if user.username in valid:
+            result.errors = [ErrorCode.USERNAME_DUPLICATED]
+            continue
+        valid[user.username] = (result, user)
+
+    for username in await run_db(db, _existing_usernames, list(valid)):
+        result, _ = valid.pop(username)
+        result.errors = [ErrorCode.USERNAME_TAKEN]
+
+    pending = list(valid.values())
+    hashed_passwords = await hash_many([user.password for _, user in pending])
+    for start in range(0, len(pending), Import.CHUNK_SIZE):
+        chunk = pending[start : start + Import.CHUNK_SIZE]
+        values = [
+            {
+                "username": user.username,
+                "email": user.email,
+                "hashed_password": hashed_password,
+                "role_id": default_role_id,
+            }
+            for (_, user), hashed_password in zip(
+                chunk, hashed_passwords[start : start + Import.CHUNK_SIZE]
+            )
+        ]
+        inserted = await run_db(db, _insert_users_chunk, values)
+        for result, user in chunk:
+            if user.username in inserted:
+                result.status = schemas.ImportStatus.created
+                result.id = inserted[user.username]
+            else:
+                result.errors = [ErrorCode.USER_NOT_INSERTED]
+
+    created = sum(result.status == schemas.ImportStatus.created for result in results)
+    return schemas.UserImportReport(
+        created=created, failed=len(results) - created, results=results
+    )
+
+
+async def update_user(
     db: Session,
-    db_user: schemas.User,
+    user_id: int,
     updated_user: schemas.UserUpdate,
 ):
-    check_user_exists(db, user_id=db_user.id)
-    check_username_exists(db, username=updated_user.username, user_id=db_user.id)
-
-    user = get_user(db, db_user.id)
     values = updated_user.model_dump(exclude_unset=True)
 
     if updated_user.password:
         check_invalid_password(password=updated_user.password)
-        values["hashed_password"] = get_password_hash(
+        values["hashed_password"] = await get_password_hash(
             values["password"]
         )
-        values.pop("password")
+        values["token_version"] = models.User.token_version + 1
+    values.pop("password", None)
 
-    db.execute(update(models.User).where(models.User.id == user.id).values(values))
-    db.commit()
-    db.refresh(user)
-    return user
+    return await run_db(db, _update_user, user_id, values)
 
 
-def delete_user(db: Session, db_user: schemas.User):
-    check_user_exists(db, user_id=db_user.id)
+def _update_user_row(db: Session, user_id: int, values: dict, *conditions) -> Optional[models.User]:
+    """Aplica `values` al usuario en una sola sentencia (UPDATE ... RETURNING).
+    Si el dialecto no soporta RETURNING, lo obtiene una única vez y lo modifica.
+    Devuelve None si ningún usuario cumple las condiciones.
+    """
+    if db.get_bind().dialect.update_returning:
+        user = db.scalars(
+            update(models.User)
+            .where(models.User.id == user_id, *conditions)
+            .values(values)
+            .returning(models.User)
+        ).one_or_none()
+        if user is not None and "role_id" not in values:
+            # RETURNING no aplica el joined load; el rol se resuelve desde el
+            # identity map cuando ya fue cargado en la sesión (sin consultar la DB)
+            user.role
+        return user
+    user = db.scalars(
+        select(models.User).where(models.User.id == user_id, *conditions)
+    ).one_or_none()
+    if user is not None:
+        for key, value in values.items():
+            setattr(user, key, value)
+        db.flush()
+    return user
+
 
-    db.delete(db_user)
+def _update_user(db: Session, user_id: int, values: dict):
+    if not values:
+        return get_user(db, user_id)
+    if "username" in values:
+        values = {**values, "username_changed_at": func.now()}
+    try:
+        user = _update_user_row(db, user_id, values)
+    except IntegrityError:
+        # el índice único de username detecta la colisión sin consultarlo antes
+        db.rollback()
+        raise exceptions.UsernameTaken()
+    if user is None:
+        db.rollback()
+        raise exceptions.UserNotFound()
     db.commit()
-    return db_user.id
+    if "username" in values:
+        username_filter.add([user.username])
+    _invalidate_tokens(user)
+    return user
 
 
-def check_role_exists(db: Session, role_id: int):
-    role = db.query(models.Role).filter(models.Role.id == role_id).first()
-    if not role:
-        raise exceptions.RoleNotFound()
+def _invalidate_tokens(user: models.User) -> None:
+    token_cache.invalidate_user(user.id)
+    token_versions.set(user.id, user.token_version)
+
+
+def delete_user(db: Session, user_id: int) -> int:
+    result = db.execute(delete(models.User).where(models.User.id == user_id))
+    if result.rowcount == 0:
+        db.rollback()
+        raise exceptions.UserNotFound()
+    db.commit()
+    token_cache.invalidate_user(user_id)
+    return user_id
 
 
 def assign_role(db: Session, user_id: int, role_id: int) -> schemas.User:
-    check_user_exists(db, user_id)
-    check_role_exists(db, role_id)
-
-    user = get_user(db, user_id)
-    db.execute(
-        update(models.User)
-        .where(models.User.id == user.id)
-        .values({"role_id": role_id})
+    # la existencia del rol se verifica en la misma sentencia (SQLite no valida FKs por defecto)
+    role_exists = select(models.Role.id).where(models.Role.id == role_id).exists()
+    user = _update_user_row(
+        db,
+        user_id,
+        {"role_id": role_id, "token_version": models.User.token_version + 1},
+        role_exists,
     )
+    if user is None:
+        db.rollback()
+        check_user_exists(db, user_id)
+        raise exceptions.RoleNotFound()
     db.commit()
-    db.refresh(user)
+    _invalidate_tokens(user)
+    # el rol cargado previamente corresponde al role_id anterior
+    db.expire(user, ["role"])
+    user.role
     return user
@@ -0,0 +1,232 @@
+import asyncio
+import datetime
+import hashlib
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from src.database import run_in_session
+from src.monitoring.service import register_collector
+from src.scheduler import PeriodicTask, scheduler
+from src.settings import (
+    USERNAME_FILTER_ENABLED,
+    USERNAME_FILTER_ERROR_RATE,
+    USERNAME_FILTER_REBUILD_INTERVAL,
+    USERNAME_FILTER_REFRESH_INTERVAL,
+)
+from src.users import models
+
+
+class BloomFilter:
+    """Conjunto aproximado sin falsos negativos: `might_contain` puede devolver True
+    para un valor que no se agregó (con probabilidad ~`error_rate` a capacidad
+    completa), pero nunca False para uno que sí se agregó.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str) -> range:
+        # doble hashing (Kirsch-Mitzenmacher): posiciones h1 + i * h2 (mod size)
+        digest = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=16).digest())
+        h1, h2 = digest >> 64, (digest & 0xFFFFFFFFFFFFFFFF) | 1
+        return range(h1, h1 + self.hashes * h2, h2)
+
+    def add(self, value: str) -> None:
+        bits, size = self._bits, self.size
+        for position in self._positions(value):
+            position %= size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain(self, value: str) -> bool:
+        bits, size = self._bits, self.size
+        for position in self._positions(value):
+            position %= size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class UsernameFilter:
+    """Filtro de Bloom con los usernames existentes, para rechazar los logins de
+    usuarios inexistentes sin buscar el usuario en la DB.
+
+    Se construye al iniciar la app y se actualiza cuando este proceso crea, importa o
+    renombra usuarios. Las altas y renombres hechos por otros workers se incorporan
+    con la actualización incremental (`user.username_changed_at`), y la
+    reconstrucción completa descarta los usernames eliminados. Como el filtro de este
+    proceso puede estar desactualizado, un username ausente sólo se rechaza
+    (`confirm_absent`) luego de una actualización iniciada después de la consulta.
+    Hasta que se carga por primera vez (o si está deshabilitado) admite cualquier
+    username.
+    """
+
+    # las transacciones que confirman más tarde que esto respecto del momento en que
+    # registraron el cambio sólo se incorporan en la próxima reconstrucción
+    CHANGE_MARGIN = datetime.timedelta(seconds=5)
+
+    def __init__(self, enabled: bool = True, error_rate: float = 0.01) -> None:
+        self.enabled = enabled
+        self.error_rate = error_rate
+        self._filter: Optional[BloomFilter] = None
+        # reloj de la DB al iniciar la última actualización completa o incremental
+        self._synced_at: Optional[datetime.datetime] = None
+        self._pending: Optional[List[str]] = None
+        self._lock = threading.Lock()
+        # actualizaciones pedidas por `confirm_absent` y última completada; una
+        # actualización en curso cubre todos los pedidos anteriores a su inicio
+        self._sync_requested = 0
+        self._sync_completed = 0
+        self._sync_task: Optional[asyncio.Future] = None
+        self.rebuilds = 0
+        self.refreshes = 0
+        self.rejected = 0
+        self.stale_misses = 0
+        self.false_positives = 0
+
+    def might_exist(self, username: str) -> bool:
+        bloom = self._filter
+        return bloom is None or bloom.might_contain(username)
+
+    async def confirm_absent(self, username: str) -> bool:
+        """True si se puede asegurar que `username` no existe: no está en el filtro
+        ni siquiera después de una actualización incremental iniciada luego de esta
+        llamada. Las llamadas concurrentes comparten la misma actualización.
+        """
+        if self.might_exist(username):
+            return False
+        self._sync_requested += 1
+        target = self._sync_requested
+        try:
+            while self._sync_completed < target:
+                if self._sync_task is None:
+                    self._sync_task = asyncio.ensure_future(self._sync())
+                await asyncio.shield(self._sync_task)
+        except Exception:
+            # sin actualización no se puede asegurar la ausencia: se consulta la DB
+            return False
+        if self.might_exist(username):
+            self.stale_misses += 1
+            return False
+        self.rejected += 1
+        return True
+
+    async def _sync(self) -> None:
+        covered = self._sync_requested
+        try:
+            await run_in_session(self.refresh)
+            self._sync_completed = max(self._sync_completed, covered)
+        finally:
+            self._sync_task = None
+
+    def add(self, usernames: Iterable[str]) -> None:
+        with self._lock:
+            if self._filter is None:
+                return
+            for username in usernames:
+                self._filter.add(username)
+                if self._pending is not None:
+                    self._pending.append(username)
+
+    def record_false_positive(self) -> None:
+        if self._filter is not None:
+            self.false_positives += 1
+
+    def rebuild(self, db: Session) -> int:
+        """Reconstruye el filtro con todos los usernames de la DB. Devuelve la
+        cantidad de usernames cargados.
+        """
+        if not self.enabled:
+            return 0
+        with self._lock:
+            # altas concurrentes con la lectura: se reaplican sobre el filtro nuevo
+            self._pending = []
+        try:
+            synced_at = db.scalar(select(func.now()))
+            total = db.scalar(select(func.count()).select_from(models.User)) or 0
+            # margen para las altas hasta la próxima reconstrucción
+            bloom = BloomFilter(max(1024, total * 2), self.error_rate)
+            rows = db.scalars(
+                select(models.User.username).execution_options(yield_per=10000)
+            )
+            for username in rows:
+                bloom.add(username)
+            with self._lock:
+                for username in self._pending:
+                    bloom.add(username)
+                self._filter = bloom
+                self._synced_at = synced_at
+                self.rebuilds += 1
+                return bloom.count
+        finally:
+            self._pending = None
+
+    def refresh(self, db: Session) -> int:
+        """Agrega los usernames creados o renombrados desde la última actualización
+        (con CHANGE_MARGIN de solapamiento; repetir un username no altera el filtro).
+        Devuelve la cantidad leída.
+        """
+        if self._filter is None:
+            return 0
+        synced_at = db.scalar(select(func.now()))
+        usernames = db.scalars(
+            select(models.User.username).where(
+                models.User.username_changed_at >= self._synced_at - self.CHANGE_MARGIN
+            )
+        ).all()
+        self.add(usernames)
+        with self._lock:
+            self._synced_at = max(self._synced_at, synced_at)
+            self.refreshes += 1
+        return len(usernames)
+
+    def stats(self) -> Dict[str, Any]:
+        bloom = self._filter
+        return {
+            "enabled": self.enabled,
+            "loaded": bloom is not None,
+            "usernames": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "bits": bloom.size if bloom else 0,
+            "hashes": bloom.hashes if bloom else 0,
+            "rebuilds": self.rebuilds,
+            "refreshes": self.refreshes,
+            "rejected": self.rejected,
+            "stale_misses": self.stale_misses,
+            "false_positives": self.false_positives,
+        }
+
+
+username_filter = UsernameFilter(USERNAME_FILTER_ENABLED, USERNAME_FILTER_ERROR_RATE)
+register_collector("username_filter", username_filter.stats)
+
+
+async def _refresh_username_filter() -> int:
+    return await run_in_session(username_filter.refresh)
+
+
+async def _rebuild_username_filter() -> int:
+    return await run_in_session(username_filter.rebuild)
+
+
+username_filter_refresher = scheduler.add(
+    PeriodicTask(
+        "username_filter_refresher",
+        USERNAME_FILTER_REFRESH_INTERVAL,
+        _refresh_username_filter,
+    )
+)
+username_filter_rebuilder = scheduler.add(
+    PeriodicTask(
+        "username_filter_rebuilder",
+        USERNAME_FILTER_REBUILD_INTERVAL,
+        _rebuild_username_filter,
+    )
+)
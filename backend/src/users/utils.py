@@ -1,9 +1,48 @@
-from sqlalchemy import select
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List, Sequence, Tuple
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from src.users import models, exceptions
+from src.users.constants import Export
+
+def parse_csv_rows(content: bytes) -> List[Dict[str, Any]]:
+    """Convierte un CSV (con encabezado) en una lista de filas para `service.import_users`."""
+    try:
+        reader = csv.DictReader(io.StringIO(content.decode("utf-8-sig")))
+        rows = list(reader)
+    except (UnicodeDecodeError, csv.Error):
+        raise exceptions.ImportInvalidFile()
+    if reader.fieldnames is None or "username" not in reader.fieldnames:
+        raise exceptions.ImportInvalidFile()
+    return rows
+
 
 def get_user_by_email(db: Session, email: str) -> models.User:
-    user = db.scalar(select(models.User).where(models.User.email == email))
+    user = db.scalar(
+        select(models.User).where(func.lower(models.User.email) == email.lower())
+    )
     if not user:
         raise exceptions.UserNotFound()
-    return user
\ No newline at end of file
+    return user
+
+async def encode_ndjson(chunks: AsyncIterator[Sequence[Tuple]]) -> AsyncIterator[str]:
+    async for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(Export.COLUMNS, row)), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+
+async def encode_csv(chunks: AsyncIterator[Sequence[Tuple]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(Export.COLUMNS)
+    async for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()